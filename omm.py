@@ -1,352 +1,2818 @@
 #!/usr/bin/env python3
 
-import argparse
-import csv
+import contextlib
+import enum
 import sys
-import yaml
 import re
 import os
+import functools
+import json
+import shutil
+import time
 
 # Define the version number
 VERSION = '0.2'
 
+# LibYAML only accepts an integer line width, this is as good as infinite
+YAML_WIDTH = 2 ** 31 - 1
+YAML_DUMP_OPTIONS = {'default_flow_style': False, 'sort_keys': False, 'width': YAML_WIDTH}
 
-def process_csv(input_file, output_file, odoo_version):
-    with open(input_file, 'r', newline='') as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=';')
-        headers = next(csv_reader)
-
-        data_dict = {}
-
-        for i, row in enumerate(csv_reader, start=2):  # Start at line 2 (since we skipped header)
-            if not re.search(r'\(\d+ rows\)', row[0]):
-                if len(row) >= 4:
-                    name = row[0]
-                    author = row[1]  # Extracted author value from index 1
-                    if name in data_dict:
-                        existing_data = data_dict[name]
-                        odoo_data = {
-                            headers[2]: row[2],
-                            headers[3]: row[3],
-                        }
-                        existing_odoo_data = existing_data.get(odoo_version, {})
-                        odoo_data["evaluation"] = existing_odoo_data.get("evaluation", "")
-                        odoo_data["comment"] = existing_odoo_data.get("comment", "")
-                        existing_data[odoo_version].update(odoo_data)
-                    else:
-                        data_dict[name] = {
-                            "name": name,
-                            "author": author,
-                            odoo_version: {
-                                headers[2]: row[2],
-                                headers[3]: row[3],
-                                "evaluation": "",
-                                "comment": ""
-                            }
-                    }
+# Phases reported by --timings, in output order
+PHASES = ['load', 'parse CSV', 'merge', 'back-fill', 'sort', 'analyse', 'dump']
+
+
+class Timings:
+    # Wall time and peak traced memory per phase. Phases are only measured
+    # once enabled by --timings, otherwise entering them costs a flag check.
+    # Time spent in nested phases is not counted for the enclosing phase.
+
+    def __init__(self):
+        self.enabled = False
+        self.phases = {}
+        self.stack = []
+
+    def start(self):
+        import tracemalloc
+        tracemalloc.start()
+        self.enabled = True
+        self.phases = {}
+        self.peak = 0
+        self.start_time = time.perf_counter()
+
+    def stop(self):
+        import tracemalloc
+        self.total = (time.perf_counter() - self.start_time, max(self.peak, tracemalloc.get_traced_memory()[1]))
+        tracemalloc.stop()
+        self.enabled = False
+
+    def record(self, name, seconds, peak=0):
+        phase = self.phases.setdefault(name, [0, 0.0, 0])
+        phase[0] += 1
+        phase[1] += seconds
+        phase[2] = max(phase[2], peak)
+        self.peak = max(self.peak, peak)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        # Re-entering a running phase, e.g. loading the shards of a sharded
+        # database, is counted as part of it
+        if not self.enabled or any(frame[0] == name for frame in self.stack):
+            yield
+            return
+        import tracemalloc
+        if self.stack:
+            self.stack[-1][2] = max(self.stack[-1][2], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        frame = [name, 0.0, 0]
+        self.stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = max(frame[2], tracemalloc.get_traced_memory()[1])
+            self.stack.pop()
+            self.record(name, seconds - frame[1], peak)
+            if self.stack:
+                self.stack[-1][1] += seconds
+                self.stack[-1][2] = max(self.stack[-1][2], peak)
+
+    def iterate(self, name, iterable):
+        # Time spent producing the items of a generator pipeline which is
+        # consumed within another phase, e.g. the CSV rows during the merge
+        if not self.enabled:
+            yield from iterable
+            return
+        iterator = iter(iterable)
+        seconds = 0.0
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                elapsed = time.perf_counter() - start
+                seconds += elapsed
+                if self.stack:
+                    self.stack[-1][1] += elapsed
+            yield item
+        self.record(name, seconds)
+
+    def report(self, stream):
+        print(f"{'Phase':<12}{'Calls':>8}{'Time':>12}{'Peak memory':>16}", file=stream)
+        for name in PHASES + sorted(set(self.phases) - set(PHASES)):
+            if name in self.phases:
+                calls, seconds, peak = self.phases[name]
+                print(f"{name:<12}{calls:>8}{seconds:>10.3f} s{peak / 2 ** 20:>12.1f} MiB", file=stream)
+        seconds, peak = self.total
+        print(f"{'total':<12}{'':>8}{seconds:>10.3f} s{peak / 2 ** 20:>12.1f} MiB", file=stream)
+
+
+timings = Timings()
+
+
+def timed(name):
+    # Decorator measuring every call of a function as the given phase
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timings.phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# PyYAML and the other larger modules are imported when a command needs them,
+# importing all of them took longer than short commands themselves
+
+
+@functools.lru_cache(maxsize=None)
+def yaml_loader():
+    # Use the LibYAML bindings when PyYAML was built with them, they are several
+    # times faster than the pure-Python implementation and produce the same output
+    import yaml
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+@functools.lru_cache(maxsize=None)
+def yaml_dumper():
+    import yaml
+    return getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+
+@functools.lru_cache(maxsize=None)
+def module_dumper():
+    class ModuleDumper(yaml_dumper()):
+        # LibYAML only emits exact str instances
+        def represent_version_key(self, data):
+            return self.represent_str(str(data))
+
+    ModuleDumper.add_representer(VersionKey, ModuleDumper.represent_version_key)
+    return ModuleDumper
+
+
+@timed('load')
+def load_yaml(yaml_file_path, Loader=None):
+    import yaml
+    with open(yaml_file_path, 'rb') as yaml_file:
+        return yaml.load(yaml_file, Loader=Loader or yaml_loader())
+
+
+@timed('dump')
+def dump_yaml(data, yaml_file_path, Dumper=None):
+    import yaml
+    with open(yaml_file_path, 'w') as yaml_file:
+        yaml.dump(data, yaml_file, Dumper=Dumper or module_dumper(), **YAML_DUMP_OPTIONS)
+
+
+# Cache files not written for this long are removed, e.g. the snapshots of
+# deleted or moved files
+CACHE_MAX_AGE = 30 * 24 * 3600
+
+# Whether this process pruned the cache directory already
+cache_pruned = False
+
+
+def cache_path(yaml_file_path, suffix='omm-cache'):
+    # Snapshots are kept in the user's cache directory, keyed by the absolute
+    # path of the YAML file, e.g. ~/.cache/omm/<sha256>.omm-cache. Next to the
+    # YAML file they could be committed or planted by others.
+    import hashlib
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    digest = hashlib.sha256(os.path.abspath(yaml_file_path).encode()).hexdigest()
+    return os.path.join(cache_home, 'omm', f'{digest}.{suffix}')
+
+
+def read_cache(cache_file, header):
+    # The payload is only read when the header line matches. It is stored with
+    # marshal, which unlike pickle only constructs plain values. Returns None
+    # for missing, outdated or corrupt caches.
+    import marshal
+    try:
+        with open(cache_file, 'rb') as f:
+            if f.readline() != header:
+                return None
+            return marshal.loads(f.read())
+    except Exception:
+        return None
+
+
+def write_cache(cache_file, header, payload):
+    import marshal
+    temp_file = f'{cache_file}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(temp_file, 'wb') as f:
+            f.write(header)
+            marshal.dump(payload, f)
+        os.replace(temp_file, cache_file)
+    except (OSError, ValueError):
+        # The cache is an optimization only, e.g. the directory may be
+        # read-only or the YAML may contain values like dates marshal can't store
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    prune_cache(os.path.dirname(cache_file))
+
+
+def prune_cache(cache_dir):
+    # Snapshots are keyed by path, so nothing replaces those of deleted
+    # files. Expired files are removed at the first write of a process only,
+    # not for every shard of a sharded database.
+    global cache_pruned
+    if cache_pruned:
+        return
+    cache_pruned = True
+    import time
+    expired = time.time() - CACHE_MAX_AGE
+    try:
+        with os.scandir(cache_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < expired:
+                    os.remove(entry.path)
+    except OSError:
+        pass
+
+
+@timed('load')
+def load_yaml_cached(yaml_file_path, use_cache=True):
+    # Read-only commands load a snapshot of the parsed YAML instead of
+    # re-parsing it. The snapshot is keyed by the file's mtime, size and content
+    # hash, so any change to the YAML file invalidates it automatically.
+    if not use_cache:
+        return load_modules(yaml_file_path)
+
+    import hashlib
+    import yaml
+    with open(yaml_file_path, 'rb') as yaml_file:
+        content = yaml_file.read()
+        stat = os.fstat(yaml_file.fileno())
+    header = f"omm-cache {VERSION} {stat.st_mtime_ns} {stat.st_size} {hashlib.sha256(content).hexdigest()}\n".encode()
+
+    # Version keys are stored as plain strings
+    cache_file = cache_path(yaml_file_path)
+    snapshot = read_cache(cache_file, header)
+    if isinstance(snapshot, list) and all(isinstance(entry, dict) for entry in snapshot):
+        return [
+            {key if key in ('name', 'author') else version_key(key): value for key, value in entry.items()}
+            for entry in snapshot
+        ]
+
+    data = normalize_modules(yaml.load(content, Loader=yaml_loader()))
+    if isinstance(data, list) and all(isinstance(entry, dict) for entry in data):
+        write_cache(cache_file, header, [{str(key): value for key, value in entry.items()} for entry in data])
+    return data
+
+
+def clear_cache(yaml_file_path):
+    try:
+        cache_files = [f for f in open_storage(yaml_file_path).cache_files() if os.path.exists(f)]
+        for cache_file in cache_files:
+            os.remove(cache_file)
+        if cache_files:
+            print(f"Removed {len(cache_files)} cache files of {yaml_file_path}.")
+        else:
+            print(f"No cache found for {yaml_file_path}.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+class VersionKey(str):
+    # Canonical version string with its sort tuple parsed once, e.g. '12.0' -> (12, 0).
+    # Instances compare and hash like plain strings, so lookups with versions
+    # given on the command line work unchanged.
+    def __new__(cls, version):
+        self = super().__new__(cls, version)
+        self.sort_key = tuple(int(part) for part in re.findall(r'\d+', self))
+        return self
+
+    def __reduce__(self):
+        return version_key, (str(self),)
+
+
+@functools.lru_cache(maxsize=None, typed=True)
+def version_key(version):
+    # YAML parses 12.0 as a float and '12.0' as a string, both map to the same key
+    return VersionKey(str(version))
+
+
+def merge_version_data(primary, secondary):
+    # Fill empty fields of primary from secondary
+    merged = dict(primary or {})
+    for field, value in (secondary or {}).items():
+        if merged.get(field) in (None, ''):
+            merged[field] = value
+    return merged
+
+
+def normalize_entry(entry):
+    # Convert version keys to VersionKey and merge duplicate float/string keys.
+    # The string key is the one imports write to, empty fields such as the
+    # evaluation are taken over from the float key. Returns whether the entry
+    # would be written differently than it was read.
+    normalized = {key: value for key, value in entry.items() if key in ('name', 'author')}
+    for key, value in entry.items():
+        if key in ('name', 'author'):
+            continue
+        version = version_key(key)
+        if version not in normalized:
+            normalized[version] = value
+        elif isinstance(key, str):
+            normalized[version] = merge_version_data(value, normalized[version])
+        else:
+            normalized[version] = merge_version_data(normalized[version], value)
+    changed = list(normalized) != list(entry)
+    entry.clear()
+    entry.update(normalized)
+    return changed
+
+
+def normalize_modules(data):
+    if isinstance(data, list):
+        for entry in data:
+            if isinstance(entry, dict):
+                normalize_entry(entry)
+    return data
+
+
+def load_modules(yaml_file_path, use_cache=False):
+    if use_cache:
+        return load_yaml_cached(yaml_file_path)
+    return normalize_modules(load_yaml(yaml_file_path))
+
+
+def split_entry_blocks(content, data):
+    # Every entry is one top-level list item, map each entry to its source
+    # text so unchanged entries can be written back without re-emitting them
+    if not isinstance(data, list) or not content.startswith(b'- '):
+        return {}
+    chunks = content.split(b'\n- ')
+    if len(chunks) != len(data):
+        return {}
+    blocks = {}
+    for i, (chunk, entry) in enumerate(zip(chunks, data)):
+        block = chunk if i == 0 else b'- ' + chunk
+        # The last entry lacks the newline if the file doesn't end with one,
+        # entries are appended after it
+        if not block.endswith(b'\n'):
+            block += b'\n'
+        # Bail out on anything not written by omm, e.g. quoted names, and on
+        # duplicate names as blocks are looked up by name
+        if not isinstance(entry, dict) or not block.startswith(f"- name: {entry.get('name')}\n".encode()) or entry['name'] in blocks:
+            return {}
+        blocks[entry['name']] = block
+    return blocks
+
+
+@timed('load')
+def load_module_file(yaml_file_path):
+    # Load modules.yaml for writing, together with the source text of each
+    # entry that is still in the canonical format
+    import yaml
+    with open(yaml_file_path, 'rb') as yaml_file:
+        content = yaml_file.read()
+    data = yaml.load(content, Loader=yaml_loader())
+    if data is None:
+        data = []
+    blocks = split_entry_blocks(content, data)
+    if isinstance(data, list):
+        for entry in data:
+            if isinstance(entry, dict) and normalize_entry(entry):
+                blocks.pop(entry.get('name'), None)
+    return data, blocks
+
+
+@timed('dump')
+def write_modules(yaml_file_path, data, blocks=None, dirty=()):
+    # Re-emit only dirty entries and entries without source text, the others
+    # are copied verbatim. The file is replaced atomically.
+    import yaml
+    temp_file = f'{yaml_file_path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_file, 'wb') as yaml_file:
+            dumper = module_dumper()
+            if not blocks:
+                yaml.dump(data, yaml_file, Dumper=dumper, encoding='utf-8', **YAML_DUMP_OPTIONS)
+            else:
+                for entry in data:
+                    block = None if entry['name'] in dirty else blocks.get(entry['name'])
+                    if block is None:
+                        block = yaml.dump([entry], Dumper=dumper, encoding='utf-8', **YAML_DUMP_OPTIONS)
+                    yaml_file.write(block)
+        if os.path.exists(yaml_file_path):
+            shutil.copymode(yaml_file_path, temp_file)
+        os.replace(temp_file, yaml_file_path)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+@timed('sort')
+def sort_modules(data):
+    # Sort entries alphabetically by name and sort version keys within each
+    # entry. Returns the names of entries whose keys were reordered.
+    data.sort(key=lambda x: x.get('name', ''))
+    reordered = set()
+    for entry in data:
+        # Sort version keys with highest version first
+        version_keys = [k for k in entry.keys() if k not in ['name', 'author']]
+        version_keys.sort(key=lambda x: version_key(x).sort_key, reverse=True)
+
+        # Reorder the entry dictionary
+        ordered_entry = {'name': entry['name'], 'author': entry['author']}
+        for version in version_keys:
+            ordered_entry[version] = entry[version]
+        if list(ordered_entry) != list(entry):
+            entry.clear()
+            entry.update(ordered_entry)
+            reordered.add(entry['name'])
+    return reordered
+
+
+class ModuleState(str, enum.Enum):
+    # States of ir_module_module and the empty state of pre-populated
+    # versions. Members compare equal to their value, other states are kept
+    # as interned strings.
+    EMPTY = ''
+    INSTALLED = 'installed'
+    NOT_INSTALLED = 'not installed'
+    UNINSTALLED = 'uninstalled'
+    UNINSTALLABLE = 'uninstallable'
+    TO_INSTALL = 'to install'
+    TO_UPGRADE = 'to upgrade'
+    TO_REMOVE = 'to remove'
+
+
+def intern_value(value):
+    # Authors, evaluations and auto_install flags repeat for most modules
+    return sys.intern(value) if type(value) is str else value
+
+
+# Looking up members on the enum class is slow, states are converted for
+# every version of every module
+MODULE_STATES = {state.value: state for state in ModuleState}
+
+
+def module_state(value):
+    if type(value) is not str:
+        return value
+    state = MODULE_STATES.get(value)
+    return state if state is not None else sys.intern(value)
+
+
+# Standard fields of a version, kept as slots of VersionRecord
+VERSION_FIELDS = ('state', 'auto_install', 'evaluation', 'comment')
+
+# Key layouts of version records, shared between records
+version_layouts = {VERSION_FIELDS: VERSION_FIELDS}
+
+
+class VersionRecord:
+    # The data of one module version. layout holds the keys present in the
+    # YAML in their order, so converting back to a dict is lossless. Keys
+    # other than the standard fields are kept in extra.
+    __slots__ = ('state', 'auto_install', 'evaluation', 'comment', 'extra', 'layout')
+
+    def __init__(self, state='', auto_install='', evaluation='', comment=''):
+        self.state = module_state(state)
+        self.auto_install = intern_value(auto_install)
+        self.evaluation = intern_value(evaluation)
+        self.comment = comment
+        self.extra = None
+        self.layout = VERSION_FIELDS
+
+    @classmethod
+    def from_dict(cls, version_data):
+        record = cls.__new__(cls)
+        get = version_data.get
+        record.state = module_state(get('state'))
+        record.auto_install = intern_value(get('auto_install'))
+        record.evaluation = intern_value(get('evaluation'))
+        record.comment = get('comment')
+        layout = tuple(version_data)
+        if layout == VERSION_FIELDS:
+            record.layout = VERSION_FIELDS
+            record.extra = None
+        else:
+            record.layout = version_layouts.setdefault(layout, layout)
+            record.extra = {key: value for key, value in version_data.items() if key not in VERSION_FIELDS} or None
+        return record
+
+    def to_dict(self):
+        if self.layout is VERSION_FIELDS:
+            state = self.state
+            return {
+                'state': state.value if isinstance(state, ModuleState) else state,
+                'auto_install': self.auto_install,
+                'evaluation': self.evaluation,
+                'comment': self.comment,
+            }
+        return {key: self.get(key) for key in self.layout}
+
+    def __len__(self):
+        return len(self.layout)
+
+    def __eq__(self, other):
+        return isinstance(other, VersionRecord) and self.to_dict() == other.to_dict()
+
+    def __reduce__(self):
+        return VersionRecord.from_dict, (self.to_dict(),)
+
+    def get(self, field, default=None):
+        if field not in self.layout:
+            return default
+        if field in VERSION_FIELDS:
+            value = getattr(self, field)
+            return value.value if isinstance(value, ModuleState) else value
+        return self.extra[field]
+
+    def set(self, field, value):
+        if field == 'state':
+            self.state = module_state(value)
+        elif field in VERSION_FIELDS:
+            setattr(self, field, intern_value(value))
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[field] = value
+        if field not in self.layout:
+            layout = self.layout + (field,)
+            self.layout = version_layouts.setdefault(layout, layout)
+
+    def update(self, version_data):
+        for field, value in version_data.items():
+            self.set(field, value)
+
+    def setdefault(self, field, value):
+        if field not in self.layout:
+            self.set(field, value)
+
+
+class Module:
+    # A module with its versions by VersionKey. Versions which aren't a
+    # mapping in the YAML, e.g. empty ones, are kept as they are.
+    __slots__ = ('name', 'author', 'versions')
+
+    def __init__(self, name, author='', versions=None):
+        self.name = name
+        self.author = intern_value(author)
+        self.versions = versions if versions is not None else {}
+
+    @classmethod
+    def from_dict(cls, entry):
+        if not isinstance(entry, dict):
+            raise ValueError("YAML file must contain a list of dictionaries.")
+        module = cls.__new__(cls)
+        module.name = entry.get('name')
+        module.author = intern_value(entry.get('author'))
+        module.versions = {
+            version_key(key): VersionRecord.from_dict(value) if isinstance(value, dict) else value
+            for key, value in entry.items() if key not in ('name', 'author')
+        }
+        return module
+
+    def to_dict(self):
+        entry = {'name': self.name}
+        if self.author is not None:
+            entry['author'] = self.author
+        for odoo_version, record in self.versions.items():
+            entry[odoo_version] = record.to_dict() if isinstance(record, VersionRecord) else record
+        return entry
+
+    def __eq__(self, other):
+        return isinstance(other, Module) and self.to_dict() == other.to_dict()
+
+    def __reduce__(self):
+        return Module, (self.name, self.author, self.versions)
+
+    def sort_versions(self):
+        # Highest version first, returns whether the order changed
+        versions = sorted(self.versions, key=lambda version: version.sort_key, reverse=True)
+        if versions == list(self.versions):
+            return False
+        self.versions = {version: self.versions[version] for version in versions}
+        return True
+
+
+def modules_from_data(data):
+    if data is None:
+        return []
+    if not isinstance(data, list):
+        raise ValueError("YAML file must contain a list of dictionaries.")
+    return [Module.from_dict(entry) for entry in data]
+
+
+def modules_to_data(modules):
+    return [module.to_dict() for module in modules]
+
+
+@timed('sort')
+def sort_module_list(modules):
+    # Like sort_modules for Module objects
+    modules.sort(key=lambda module: module.name or '')
+    return {module.name for module in modules if module.sort_versions()}
+
+
+class AuthorFilter:
+    # Case-insensitive partial match of authors against include and exclude
+    # terms. All terms are compiled into one case-folded regex each, and the
+    # result is memoized per distinct author since the same authors repeat
+    # across thousands of modules.
+
+    def __init__(self, include_authors=None, exclude_authors=None):
+        self.include = self.compile(include_authors)
+        self.exclude = self.compile(exclude_authors)
+        self.memo = {}
+
+    @staticmethod
+    def compile(terms):
+        if not terms:
+            return None
+        return re.compile('|'.join(re.escape(term.casefold()) for term in terms))
+
+    def __bool__(self):
+        return self.include is not None or self.exclude is not None
+
+    def __call__(self, author):
+        try:
+            return self.memo[author]
+        except KeyError:
+            pass
+        folded = (author or '').casefold()
+        matches = (
+            (self.include is None or self.include.search(folded) is not None)
+            and (self.exclude is None or self.exclude.search(folded) is None)
+        )
+        self.memo[author] = matches
+        return matches
+
+
+# Groups reported by analyse, in output order
+STATE_GROUPS = [
+    'Not evaluated',
+    'Required but not installed',
+    'Desired but not installed',
+    'Not desired but installed',
+    'Not required but installed'
+]
+
+
+REQUIRED_AND_MIGRATED = 'Required and migrated'
+
+# Color codes for different states
+STATE_COLORS = {
+    'Not evaluated': '\033[93m',  # Yellow
+    'Required but not installed': '\033[91m',  # Red
+    'Desired but not installed': '\033[94m',  # Blue
+    'Not desired but installed': '\033[95m',  # Magenta
+    'Not required but installed': '\033[96m',  # Cyan
+    REQUIRED_AND_MIGRATED: '\033[92m',  # Green
+}
+RESET_COLOR = '\033[0m'
+
+# Abbreviations used in the module x version matrix
+STATE_CODES = {
+    'Not evaluated': 'NE',
+    'Required but not installed': 'RN',
+    'Desired but not installed': 'DN',
+    'Not desired but installed': 'NDI',
+    'Not required but installed': 'NRI',
+    REQUIRED_AND_MIGRATED: 'RM',
+}
+
+
+def classify_module(module, odoo_version):
+    record = module.versions.get(odoo_version)
+    if not isinstance(record, VersionRecord) or not record.evaluation:
+        return 'Not evaluated'
+    state = record.state
+    evaluation = record.evaluation
+
+    if state is ModuleState.NOT_INSTALLED:
+        if evaluation == 'required':
+            return 'Required but not installed'
+        elif evaluation == 'desired':
+            return 'Desired but not installed'
+    elif state is ModuleState.INSTALLED:
+        if evaluation == 'not desired':
+            return 'Not desired but installed'
+        elif evaluation == 'not required':
+            return 'Not required but installed'
+        elif evaluation == 'required':
+            return REQUIRED_AND_MIGRATED
+    return None
+
+
+def module_matrix(modules, odoo_versions, author_filter=None):
+    # Classify every requested version of each module in a single pass
+    for module in modules:
+        author = module.author if module.author is not None else ''
+        # Apply author filtering
+        if author_filter and not author_filter(author):
+            continue
+        yield module.name or '', author, [classify_module(module, odoo_version) for odoo_version in odoo_versions]
+
+
+@timed('analyse')
+def group_modules_by_version(modules, odoo_versions, author_filter=None):
+    # Dictionary to group modules by their state, per version
+    state_groups = [{state_name: [] for state_name in STATE_GROUPS} for odoo_version in odoo_versions]
+    required_and_migrated_counts = [0] * len(odoo_versions)
+
+    for name, author, groups in module_matrix(modules, odoo_versions, author_filter):
+        for i, group in enumerate(groups):
+            if group == REQUIRED_AND_MIGRATED:
+                required_and_migrated_counts[i] += 1
+            elif group is not None:
+                state_groups[i][group].append(name)
+
+    return {
+        odoo_version: (state_groups[i], required_and_migrated_counts[i])
+        for i, odoo_version in enumerate(odoo_versions)
+    }
+
+
+def group_modules(modules, odoo_version, author_filter=None):
+    return group_modules_by_version(modules, [odoo_version], author_filter)[odoo_version]
+
+
+def collect_versions(modules):
+    versions = {odoo_version for module in modules for odoo_version in module.versions}
+    return sorted(versions, key=lambda version: version.sort_key)
+
+
+# Fields compared by compare, author is taken from the module itself
+DIFF_FIELDS = ['state', 'auto_install', 'evaluation', 'author']
+DIFF_CHANGES = ['added', 'removed', 'changed']
+
+
+def version_side(modules, odoo_version, author_filter=None):
+    # (name, author, version record) of all modules having the version,
+    # sorted by name as required by diff_modules
+    side = []
+    for module in modules:
+        record = module.versions.get(odoo_version)
+        if module.name and record and (not author_filter or author_filter(module.author)):
+            side.append((module.name, module.author, record))
+    # Files written by omm are sorted already
+    if any(side[i][0] > side[i + 1][0] for i in range(len(side) - 1)):
+        side.sort(key=lambda item: item[0])
+    return side
+
+
+def diff_value(item, field):
+    if item is None:
+        return None
+    name, author, version_data = item
+    return author if field == 'author' else version_data.get(field)
+
+
+def diff_modules(source, target, fields=DIFF_FIELDS):
+    # Merge two sides sorted by module name in a single linear pass and yield
+    # (change, name, source item, target item, changed fields)
+    source = iter(source)
+    target = iter(target)
+    source_item = next(source, None)
+    target_item = next(target, None)
+    while source_item is not None or target_item is not None:
+        if target_item is None or (source_item is not None and source_item[0] < target_item[0]):
+            yield 'removed', source_item[0], source_item, None, []
+            source_item = next(source, None)
+        elif source_item is None or target_item[0] < source_item[0]:
+            yield 'added', target_item[0], None, target_item, []
+            target_item = next(target, None)
+        else:
+            changed_fields = [field for field in fields if diff_value(source_item, field) != diff_value(target_item, field)]
+            if changed_fields:
+                yield 'changed', source_item[0], source_item, target_item, changed_fields
+            source_item = next(source, None)
+            target_item = next(target, None)
+
+
+class Storage:
+    # Queries shared by all storages, implemented on top of load()
+
+    def load_list(self, use_cache=False, select=None):
+        data = self.load(use_cache, select)
+        if data is None:
+            data = []
+        if not isinstance(data, list):
+            raise ValueError("YAML file must contain a list of dictionaries.")
+        return data
+
+    def load_authors(self, use_cache=False, author_filter=None):
+        # Sharded databases only load shards with modules of matching authors
+        select = (lambda name, author: author_filter(author)) if author_filter else None
+        return self.load_list(use_cache, select)
+
+    def load_model(self, use_cache=False, author_filter=None):
+        return modules_from_data(self.load_authors(use_cache, author_filter))
+
+    def load_model_for_update(self):
+        return modules_from_data(self.load_for_update())
+
+    def save_model(self, modules, dirty=None):
+        self.save(modules_to_data(modules), dirty)
+
+    def analyse_groups(self, odoo_version, author_filter=None, use_cache=False):
+        modules = self.load_model(use_cache, author_filter)
+        return group_modules(modules, odoo_version, author_filter)
+
+    def version_sides(self, odoo_versions, author_filter=None, use_cache=False):
+        modules = self.load_model(use_cache, author_filter)
+        return [version_side(modules, odoo_version, author_filter) for odoo_version in odoo_versions]
+
+    def analyse_matrix(self, odoo_versions=None, author_filter=None, use_cache=False):
+        # All versions found in the data unless versions are given. Rows are
+        # generated lazily so they can be streamed while being classified.
+        modules = self.load_model(use_cache, author_filter)
+        if odoo_versions is None:
+            odoo_versions = collect_versions(modules)
+        return odoo_versions, module_matrix(modules, odoo_versions, author_filter)
+
+
+class YAMLStorage(Storage):
+    # A single modules.yaml file
+
+    def __init__(self, path):
+        self.path = path
+        self.blocks = {}
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self, use_cache=False, select=None):
+        # select is a hint which modules are needed, a single file is always
+        # parsed completely
+        return load_modules(self.path, use_cache)
+
+    def load_for_update(self):
+        if not self.exists():
+            return []
+        data, self.blocks = load_module_file(self.path)
+        return data
+
+    def save(self, data, dirty=None):
+        # Without dirty entries everything is considered changed
+        if dirty is None:
+            write_modules(self.path, data)
+        else:
+            write_modules(self.path, data, self.blocks, dirty)
+
+    def cache_files(self):
+        return [cache_path(self.path), cache_path(self.path, HISTORY_CACHE_SUFFIX)]
+
+
+class ShardedStorage(Storage):
+    # A directory with one YAML file per module (prefix_length 0) or per name
+    # prefix, plus an index of all module names and authors:
+    #   modules/index.yaml
+    #   modules/shards/account.yaml
+    index_file = 'index.yaml'
+    shards_directory = 'shards'
+
+    def __init__(self, path, prefix_length=None):
+        self.path = path
+        self.prefix_length = prefix_length
+        self.index = {}
+        self.shards = {}
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, self.index_file))
+
+    def read_index(self):
+        index = load_yaml(os.path.join(self.path, self.index_file)) or {}
+        if self.prefix_length is None:
+            self.prefix_length = index.get('prefix_length', 0)
+        return index.get('modules') or {}
+
+    def shard_name(self, name):
+        return name[:self.prefix_length] if self.prefix_length else name
+
+    def shard_storage(self, shard):
+        return YAMLStorage(os.path.join(self.path, self.shards_directory, f'{shard}.yaml'))
+
+    def load(self, use_cache=False, select=None):
+        # Only shards containing modules accepted by select(name, author) are
+        # loaded, other modules of those shards are returned as well
+        if not self.exists():
+            raise FileNotFoundError(f"No module index found in {self.path}")
+        data = []
+        shards = sorted({
+            self.shard_name(name) for name, author in self.read_index().items()
+            if select is None or select(name, author)
+        })
+        for shard in shards:
+            data.extend(self.shard_storage(shard).load(use_cache) or [])
+        return data
+
+    def load_for_update(self):
+        data = []
+        if not self.exists():
+            return data
+        self.index = self.read_index()
+        for shard in sorted({self.shard_name(name) for name in self.index}):
+            storage = self.shard_storage(shard)
+            entries = storage.load_for_update()
+            self.shards[shard] = (storage, [entry['name'] for entry in entries])
+            data.extend(entries)
+        return data
+
+    def save(self, data, dirty=None):
+        if self.prefix_length is None:
+            self.prefix_length = 0
+        os.makedirs(os.path.join(self.path, self.shards_directory), exist_ok=True)
+
+        entries_by_shard = {}
+        for entry in data:
+            entries_by_shard.setdefault(self.shard_name(entry['name']), []).append(entry)
+
+        # Only write shards with changed entries or changed membership
+        for shard, entries in entries_by_shard.items():
+            storage, names = self.shards.get(shard, (None, None))
+            if storage is None or dirty is None:
+                self.shard_storage(shard).save(entries)
+            elif names != [entry['name'] for entry in entries] or any(entry['name'] in dirty for entry in entries):
+                storage.save(entries, dirty)
+        for shard in [shard for shard in self.shards if shard not in entries_by_shard]:
+            os.remove(self.shards.pop(shard)[0].path)
+
+        index = {entry['name']: entry['author'] for entry in data}
+        if dirty is None or index != self.index:
+            write_modules(os.path.join(self.path, self.index_file), {
+                'prefix_length': self.prefix_length,
+                'modules': index
+            })
+            self.index = index
+
+    def cache_files(self):
+        shards_path = os.path.join(self.path, self.shards_directory)
+        if not os.path.isdir(shards_path):
+            return []
+        return [
+            cache_file for filename in sorted(os.listdir(shards_path)) if filename.endswith('.yaml')
+            for cache_file in self.shard_storage(filename[:-len('.yaml')]).cache_files()
+        ]
+
+
+SQLITE_SUFFIXES = ('.sqlite', '.sqlite3', '.db')
+
+
+class SQLiteStorage(Storage):
+    # An SQLite database with one row per module and one row per module and
+    # version, indexed for analyse and compare queries
+    schema = """
+        CREATE TABLE IF NOT EXISTS modules (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            author TEXT NOT NULL DEFAULT ''
+        );
+        CREATE TABLE IF NOT EXISTS versions (
+            module_id INTEGER NOT NULL REFERENCES modules (id) ON DELETE CASCADE,
+            version TEXT NOT NULL,
+            state TEXT,
+            auto_install TEXT,
+            evaluation TEXT,
+            comment TEXT,
+            extra TEXT,
+            layout TEXT,
+            PRIMARY KEY (module_id, version)
+        );
+        CREATE INDEX IF NOT EXISTS modules_author ON modules (author);
+        CREATE INDEX IF NOT EXISTS versions_version_state ON versions (version, state);
+        CREATE INDEX IF NOT EXISTS versions_version_evaluation ON versions (version, evaluation);
+    """
+    fields = ('state', 'auto_install', 'evaluation', 'comment')
+
+    def __init__(self, path):
+        self.path = path
+        self.module_names = set()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def connect(self):
+        import sqlite3
+        connection = sqlite3.connect(self.path)
+        connection.execute('PRAGMA foreign_keys = ON')
+        connection.executescript(self.schema)
+        # Databases written before the layout column was added
+        if 'layout' not in [column[1] for column in connection.execute('PRAGMA table_info(versions)')]:
+            connection.execute('ALTER TABLE versions ADD COLUMN layout TEXT')
+        return connection
+
+    @timed('load')
+    def load(self, use_cache=False, select=None):
+        if not self.exists():
+            raise FileNotFoundError(f"{self.path} not found")
+        data = []
+        entry = None
+        with contextlib.closing(self.connect()) as connection:
+            rows = connection.execute("""
+                SELECT m.name, m.author, v.version, v.state, v.auto_install, v.evaluation, v.comment, v.extra, v.layout
+                FROM modules m LEFT JOIN versions v ON v.module_id = m.id
+                ORDER BY m.name
+            """)
+            for name, author, version, *values in rows:
+                if entry is None or entry['name'] != name:
+                    entry = {'name': name, 'author': author}
+                    data.append(entry)
+                if version is not None:
+                    entry[version_key(version)] = self.version_data(*values)
+        sort_modules(data)
+        return data
+
+    def load_for_update(self):
+        if not self.exists():
+            return []
+        data = self.load()
+        self.module_names = {entry['name'] for entry in data}
+        return data
+
+    @timed('dump')
+    def save(self, data, dirty=None):
+        with contextlib.closing(self.connect()) as connection, connection:
+            if dirty is None:
+                connection.execute('DELETE FROM modules')
+                entries = data
+            else:
+                names = {entry['name'] for entry in data}
+                connection.executemany('DELETE FROM modules WHERE name = ?', [(name,) for name in self.module_names - names])
+                entries = [entry for entry in data if entry['name'] in dirty or entry['name'] not in self.module_names]
+
+            for entry in entries:
+                connection.execute("""
+                    INSERT INTO modules (name, author) VALUES (?, ?)
+                    ON CONFLICT (name) DO UPDATE SET author = excluded.author
+                """, (entry['name'], entry.get('author') or ''))
+                module_id = connection.execute('SELECT id FROM modules WHERE name = ?', (entry['name'],)).fetchone()[0]
+                connection.execute('DELETE FROM versions WHERE module_id = ?', (module_id,))
+                connection.executemany(
+                    'INSERT INTO versions VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    [self.version_row(module_id, version, version_data) for version, version_data in entry.items() if version not in ('name', 'author')]
+                )
+        self.module_names = {entry['name'] for entry in data}
+
+    def version_row(self, module_id, version, version_data):
+        # Fields other than the standard ones are kept as JSON. The keys and
+        # their order are only stored if they differ from the standard fields
+        # with values, like VersionRecord.layout, null versions as JSON null.
+        if version_data is None:
+            return (module_id, str(version_key(version)), None, None, None, None, None, 'null')
+        layout = tuple(version_data)
+        version_data = dict(version_data)
+        values = [version_data.pop(field, None) for field in self.fields]
+        extra = json.dumps(version_data) if version_data else None
+        if layout == self.fields and None not in values:
+            layout = None
+        else:
+            layout = json.dumps(layout)
+        return (module_id, str(version_key(version)), *values, extra, layout)
+
+    def version_data(self, state, auto_install, evaluation, comment, extra, layout):
+        # The inverse of version_row, rows without layout hold the standard
+        # fields which aren't NULL
+        if layout == 'null':
+            return None
+        version_data = {field: value for field, value in zip(self.fields, (state, auto_install, evaluation, comment)) if value is not None or layout}
+        if extra:
+            version_data.update(json.loads(extra))
+        if layout:
+            version_data = {key: version_data.get(key) for key in json.loads(layout)}
+        return version_data
+
+    def author_condition(self, connection, author_filter):
+        # SQLite's lower() only folds ASCII characters, so the Python matcher
+        # is used as SQL function, it is evaluated once per distinct author
+        if not author_filter:
+            return '1'
+        connection.create_function('omm_author_matches', 1, author_filter, deterministic=True)
+        return 'omm_author_matches(m.author)'
+
+    @timed('analyse')
+    def analyse_groups(self, odoo_version, author_filter=None, use_cache=False):
+        if not self.exists():
+            raise FileNotFoundError(f"{self.path} not found")
+        state_groups = {state_name: [] for state_name in STATE_GROUPS}
+        with contextlib.closing(self.connect()) as connection:
+            condition = self.author_condition(connection, author_filter)
+            rows = connection.execute(f"""
+                SELECT grp, name FROM (
+                    SELECT m.name, CASE
+                        WHEN COALESCE(v.evaluation, '') = '' THEN 'Not evaluated'
+                        WHEN v.state = 'not installed' AND v.evaluation = 'required' THEN 'Required but not installed'
+                        WHEN v.state = 'not installed' AND v.evaluation = 'desired' THEN 'Desired but not installed'
+                        WHEN v.state = 'installed' AND v.evaluation = 'not desired' THEN 'Not desired but installed'
+                        WHEN v.state = 'installed' AND v.evaluation = 'not required' THEN 'Not required but installed'
+                    END AS grp
+                    FROM modules m LEFT JOIN versions v ON v.module_id = m.id AND v.version = ?
+                    WHERE {condition}
+                ) WHERE grp IS NOT NULL
+                ORDER BY name
+            """, (str(odoo_version),))
+            for group, name in rows:
+                state_groups[group].append(name)
+
+            required_and_migrated_count = connection.execute(f"""
+                SELECT COUNT(*) FROM modules m JOIN versions v ON v.module_id = m.id
+                WHERE v.version = ? AND v.state = 'installed' AND v.evaluation = 'required' AND {condition}
+            """, (str(odoo_version),)).fetchone()[0]
+        return state_groups, required_and_migrated_count
+
+    @timed('load')
+    def version_sides(self, odoo_versions, author_filter=None, use_cache=False):
+        if not self.exists():
+            raise FileNotFoundError(f"{self.path} not found")
+        sides = []
+        with contextlib.closing(self.connect()) as connection:
+            condition = self.author_condition(connection, author_filter)
+            for odoo_version in odoo_versions:
+                rows = connection.execute(f"""
+                    SELECT m.name, m.author, v.state, v.auto_install, v.evaluation, v.comment, v.extra, v.layout
+                    FROM modules m JOIN versions v ON v.module_id = m.id AND v.version = ?
+                    WHERE {condition}
+                    ORDER BY m.name
+                """, (str(odoo_version),))
+                side = []
+                for name, author, *values in rows:
+                    version_data = self.version_data(*values)
+                    if version_data:
+                        side.append((name, author, version_data))
+                sides.append(side)
+        return sides
+
+    def cache_files(self):
+        return []
+
+
+class FleetStorage(Storage):
+    # A directory with the modules of many databases (tenants). catalog.yaml
+    # holds the modules with their author and the evaluation and comment per
+    # version once for all tenants. tenants/<tenant>.yaml only holds the names
+    # of the tenant's modules and their states per version. Modules which are
+    # neither installed nor listed in states are not installed:
+    #   modules: [account, sale, stock]
+    #   '15.0': {installed: [account], auto_install: [], states: {stock: to upgrade}}
+    # Loading a tenant presents the usual list of modules with the versions
+    # of the tenant, so all commands work on it unchanged.
+    catalog_fields = ('evaluation', 'comment')
+
+    def __init__(self, path, tenant=None):
+        self.path = path
+        self.tenant = tenant
+        self.catalog = YAMLStorage(os.path.join(path, 'catalog.yaml'))
+        self.catalog_data = []
+        # Catalog modules changed since loading, the catalog blocks are only
+        # read once
+        self.catalog_dirty = set()
+
+    def tenant_path(self, tenant):
+        if not tenant or os.sep in tenant or tenant.startswith('.'):
+            raise ValueError(f"Invalid tenant name '{tenant}'.")
+        return os.path.join(self.path, 'tenants', f'{tenant}.yaml')
+
+    def tenants(self):
+        tenants_dir = os.path.join(self.path, 'tenants')
+        if not os.path.isdir(tenants_dir):
+            return []
+        return sorted(f[:-len('.yaml')] for f in os.listdir(tenants_dir) if f.endswith('.yaml') and not f.startswith('.'))
+
+    def require_tenant(self):
+        if self.tenant is None:
+            raise ValueError(f"{self.path} holds several databases, please provide a tenant.")
+
+    def exists(self):
+        self.require_tenant()
+        return os.path.exists(self.tenant_path(self.tenant))
+
+    def read_tenant(self, tenant):
+        tenant_file = self.tenant_path(tenant)
+        if not os.path.exists(tenant_file):
+            return {}
+        tenant_data = load_yaml(tenant_file) or {}
+        return {key if key == 'modules' else version_key(key): value for key, value in tenant_data.items()}
+
+    def load_catalog(self, use_cache=False):
+        if not self.catalog.exists():
+            return []
+        return self.catalog.load(use_cache) or []
+
+    def tenant_view(self, catalog, tenant_data):
+        # Module entries of a tenant with the catalog's evaluations of the
+        # tenant's versions
+        names = set(tenant_data.get('modules') or [])
+        versions = {
+            odoo_version: (
+                set(version_data.get('installed') or []),
+                set(version_data.get('auto_install') or []),
+                version_data.get('states') or {},
+            )
+            for odoo_version, version_data in tenant_data.items() if odoo_version != 'modules'
+        }
+        view = []
+        for catalog_entry in catalog:
+            name = catalog_entry.get('name')
+            if name not in names:
+                continue
+            entry = {'name': name, 'author': catalog_entry.get('author', '')}
+            odoo_versions = [key for key in catalog_entry if key in versions]
+            odoo_versions += [odoo_version for odoo_version in versions if odoo_version not in catalog_entry]
+            for odoo_version in odoo_versions:
+                catalog_version_data = catalog_entry.get(odoo_version) or {}
+                installed, auto_install, states = versions[odoo_version]
+                state = 'installed' if name in installed else states.get(name, 'not installed')
+                auto_install = 't' if name in auto_install else 'f' if state else ''
+                entry[odoo_version] = {
+                    'state': state,
+                    'auto_install': auto_install,
+                    'evaluation': catalog_version_data.get('evaluation', ''),
+                    'comment': catalog_version_data.get('comment', ''),
+                }
+            view.append(entry)
+        sort_modules(view)
+        return view
+
+    def load(self, use_cache=False, select=None):
+        if not self.exists():
+            raise FileNotFoundError(f"{self.tenant_path(self.tenant)} not found")
+        return self.tenant_view(self.load_catalog(use_cache), self.read_tenant(self.tenant))
+
+    def load_for_update(self):
+        self.require_tenant()
+        self.catalog_data = self.catalog.load_for_update() or []
+        self.catalog_dirty = set()
+        return self.tenant_view(self.catalog_data, self.read_tenant(self.tenant))
+
+    def save(self, data, dirty=None):
+        # New modules are added to the catalog, evaluations are only taken
+        # from the tenant for versions the catalog doesn't know yet
+        catalog_by_name = {entry.get('name'): entry for entry in self.catalog_data}
+        catalog_dirty = self.catalog_dirty
+        tenant_data = {'modules': []}
+        for entry in data:
+            name = entry['name']
+            catalog_entry = catalog_by_name.get(name)
+            if catalog_entry is None:
+                catalog_entry = catalog_by_name[name] = {'name': name, 'author': entry.get('author', '')}
+                self.catalog_data.append(catalog_entry)
+                catalog_dirty.add(name)
+            elif entry.get('author') and catalog_entry.get('author') != entry['author']:
+                catalog_entry['author'] = entry['author']
+                catalog_dirty.add(name)
+            tenant_data['modules'].append(name)
+            for odoo_version, version_data in entry.items():
+                if odoo_version in ('name', 'author'):
+                    continue
+                version_data = version_data or {}
+                if odoo_version not in catalog_entry:
+                    catalog_entry[odoo_version] = {field: version_data.get(field, '') for field in self.catalog_fields}
+                    catalog_dirty.add(name)
+                # Every version of the tenant is kept, even without states,
+                # e.g. right after add-version
+                state = version_data.get('state') or ''
+                tenant_version_data = tenant_data.setdefault(odoo_version, {'installed': [], 'auto_install': []})
+                if state == 'installed':
+                    tenant_version_data['installed'].append(name)
+                elif state != 'not installed':
+                    tenant_version_data.setdefault('states', {})[name] = state
+                if version_data.get('auto_install') == 't':
+                    tenant_version_data['auto_install'].append(name)
+
+        os.makedirs(os.path.join(self.path, 'tenants'), exist_ok=True)
+        catalog_dirty |= sort_modules(self.catalog_data)
+        self.catalog.save(self.catalog_data, catalog_dirty)
+        odoo_versions = sorted((key for key in tenant_data if key != 'modules'), key=lambda key: version_key(key).sort_key, reverse=True)
+        tenant_data = {'modules': sorted(tenant_data['modules']), **{key: tenant_data[key] for key in odoo_versions}}
+        dump_yaml(tenant_data, self.tenant_path(self.tenant))
+
+    def cache_files(self):
+        return self.catalog.cache_files()
+
+
+def is_fleet(path):
+    return os.path.exists(os.path.join(path, 'catalog.yaml'))
+
+
+def open_storage(path, prefix_length=None, tenant=None):
+    # Fleets are directories with a catalog.yaml, other directories (or paths
+    # ending with a separator) hold sharded databases. A tenant may start a
+    # new fleet, but not in another module database.
+    if tenant is not None and not is_fleet(path) and (os.path.isfile(path) or os.path.isdir(path) and os.listdir(path)):
+        raise ValueError(f"{path} is not a fleet directory, --tenant is only supported for fleets.")
+    if tenant is not None or is_fleet(path):
+        return FleetStorage(path, tenant)
+    if os.path.isdir(path) or path.endswith(('/', os.sep)):
+        return ShardedStorage(path, prefix_length)
+    if path.endswith(SQLITE_SUFFIXES):
+        return SQLiteStorage(path)
+    return YAMLStorage(path)
+
+
+# psql appends a "(<number> rows)" footer to its output
+CSV_FOOTER_PATTERN = re.compile(r'\(\d+ rows?\)')
+
+
+def open_csv(input_file):
+    # '-' reads the CSV from stdin, e.g. psql ... | omm.py import-csv - modules.yaml 15.0
+    if input_file == '-':
+        return contextlib.nullcontext(sys.stdin)
+    return open(input_file, 'r', newline='')
+
+
+def parse_csv(csv_file):
+    import csv
+    csv_reader = csv.reader(csv_file, delimiter=';')
+    headers = next(csv_reader, None)
+    if headers is None:
+        raise ValueError("CSV input is empty.")
+    return headers, enumerate(csv_reader, start=2)  # Start at line 2 (since we skipped header)
+
+
+def filter_csv_rows(rows, headers):
+    for i, row in rows:
+        if len(row) >= 4:
+            # Exports of several databases concatenated repeat the header
+            if row != headers:
+                yield i, row
+        elif not row:
+            continue
+        # Footers consist of a single column, so only short rows are checked
+        elif CSV_FOOTER_PATTERN.search(row[0]):
+            print(f"Skipping row {i}: {row}. It contains the pattern '(<number> rows)'.")
+        else:
+            print(f"Skipping row {i}: {row}. It doesn't have enough columns.")
+
+
+def normalize_csv_rows(rows, headers):
+    for i, row in rows:
+        yield row[0], row[1], {headers[2]: row[2], headers[3]: row[3]}
+
+
+def read_csv_records(csv_file):
+    # Generator pipeline: parse -> filter footer lines -> normalize, the rows
+    # are merged one at a time so the CSV is never held in memory
+    headers, rows = parse_csv(csv_file)
+    return timings.iterate('parse CSV', normalize_csv_rows(filter_csv_rows(rows, headers), headers))
+
+
+@timed('merge')
+def merge_modules(modules, records, odoo_version):
+    # Index existing modules by name once, so merging is linear in the number
+    # of modules instead of scanning the whole list for every CSV row.
+    # Returns the names of modules which were added or changed.
+    odoo_version = version_key(odoo_version)
+    modules_by_name = {}
+    for module in modules:
+        modules_by_name.setdefault(module.name, module)
+
+    imported_names = set()
+    changed = set()
+    for name, author, version_data in records:
+        imported_names.add(name)
+        module = modules_by_name.get(name)
+        if module is not None:
+            record = module.versions.get(odoo_version)
+            if not isinstance(record, VersionRecord):
+                record = module.versions[odoo_version] = VersionRecord.from_dict({})
+            for field, value in version_data.items():
+                if field not in record.layout or record.get(field) != value:
+                    record.set(field, value)
+                    changed.add(name)
+            # Keep evaluation and comment of existing modules
+            for field in ('evaluation', 'comment'):
+                if field not in record.layout:
+                    record.set(field, '')
+                    changed.add(name)
+        else:
+            module = Module(name, author, {odoo_version: VersionRecord.from_dict(dict(version_data, evaluation="", comment=""))})
+            modules.append(module)
+            modules_by_name[name] = module
+            changed.add(name)
+
+    # Handle modules that exist in YAML but not in CSV - set their state to "not installed"
+    with timings.phase('back-fill'):
+        for module in modules:
+            if module.name and module.name not in imported_names:
+                record = module.versions.get(odoo_version)
+                if isinstance(record, VersionRecord):
+                    if record.state is not ModuleState.NOT_INSTALLED:
+                        record.set('state', 'not installed')
+                        changed.add(module.name)
+                else:
+                    # If the version doesn't exist, create it with "not installed" state
+                    module.versions[odoo_version] = VersionRecord('not installed', '', '', '')
+                    changed.add(module.name)
+
+    return changed
+
+
+def process_csv(input_file, output_file, odoo_version, tenant=None):
+    try:
+        db = ModuleDB(output_file, tenant)
+        db.import_csv(input_file, odoo_version)
+        db.save()
+
+        if db.created and tenant is not None:
+            print(f"Tenant {tenant} not found. Created it in {output_file} with the data.")
+        elif db.created:
+            print(f"{output_file} not found. Created a new file with the data.")
+        else:
+            print(f"Data appended/merged to {output_file} successfully.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+def read_csv_file(input_file):
+    with open_csv(input_file) as csv_file:
+        return list(read_csv_records(csv_file))
+
+
+def read_csv_files(input_files, jobs=None):
+    # Parse the CSV files in parallel, the merge itself is cheap
+    with timings.phase('parse CSV'):
+        if len(input_files) > 1 and jobs != 1:
+            import concurrent.futures
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+                return list(executor.map(read_csv_file, input_files))
+        return [read_csv_file(input_file) for input_file in input_files]
+
+
+def read_import_manifest(manifest_file):
+    # One "<csv file> <odoo version>" pair per line, '#' starts a comment
+    imports = []
+    with open(manifest_file, 'r') as f:
+        for i, line in enumerate(f, start=1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.rsplit(None, 1)
+            if len(parts) != 2:
+                raise ValueError(f"Line {i} of {manifest_file} must contain '<csv file> <odoo version>'.")
+            imports.append((parts[0], parts[1]))
+    return imports
+
+
+def parse_import_pair(value):
+    input_file, separator, odoo_version = value.rpartition(':')
+    if not separator or not input_file or not odoo_version:
+        import argparse
+        raise argparse.ArgumentTypeError(f"'{value}' must have the form <csv file>:<odoo version>")
+    return input_file, odoo_version
+
+
+def import_batch(output_file, imports, jobs=None):
+    try:
+        db = ModuleDB(output_file)
+        versions = ', '.join(db.import_batch(imports, jobs))
+        db.save()
+
+        if db.created:
+            print(f"{output_file} not found. Created a new file with {len(imports)} CSV files for versions {versions}.")
+        else:
+            print(f"Merged {len(imports)} CSV files for versions {versions} to {output_file} successfully.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+# Same query as the psql export described in the README
+DB_MODULE_QUERY = "SELECT name, author, state, auto_install FROM ir_module_module WHERE state = 'installed' ORDER BY name"
+DB_BATCH_SIZE = 2000
+
+
+def open_db_cursor(dsn):
+    try:
+        import psycopg2
+    except ImportError:
+        raise ImportError("import-db requires psycopg2, install it with 'pip install psycopg2-binary'.")
+    connection = psycopg2.connect(dsn)
+    # Named cursors are server-side cursors in psycopg2, rows are only
+    # transferred when fetched
+    return connection, connection.cursor(name='omm_ir_module_module')
+
+
+def fetch_db_records(cursor, batch_size=DB_BATCH_SIZE):
+    cursor.execute(DB_MODULE_QUERY)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for name, author, state, auto_install in rows:
+            # Format booleans and NULL like psql does in the CSV export
+            if isinstance(auto_install, (bool, int)):
+                auto_install = 't' if auto_install else 'f'
+            yield name, author or '', {'state': state, 'auto_install': auto_install or ''}
+
+
+def import_db(dsn, output_file, odoo_version, cursor=None, batch_size=DB_BATCH_SIZE):
+    try:
+        db = ModuleDB(output_file)
+        db.import_db(dsn, odoo_version, cursor, batch_size)
+        db.save()
+
+        if db.created:
+            print(f"{output_file} not found. Created a new file with the data.")
+        else:
+            print(f"Data appended/merged to {output_file} successfully.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+class ModuleDB:
+    # A module database which is loaded once. Imports and version changes are
+    # applied in memory, analyse and compare already see them and save()
+    # writes all changes at once:
+    #
+    #   db = ModuleDB('modules.yaml')
+    #   db.import_csv('installed-modules.csv', '12.0')
+    #   db.add_version('15.0')
+    #   db.analyse('15.0')
+    #   db.save()
+    #
+    # Used as context manager the database is saved unless an error occurred.
+
+    def __init__(self, path, tenant=None, prefix_length=None):
+        self.path = path
+        self.storage = open_storage(path, prefix_length, tenant)
+        self.created = not self.storage.exists()
+        self.modules = self.storage.load_model_for_update()
+        # Names of the modules changed since loading, None once all changed.
+        # The storages only read the source text when loading, so modules
+        # stay dirty after a save.
+        self.dirty = set()
+        self.changed = False
+
+    def __str__(self):
+        return str(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.save()
+
+    def mark_changed(self, dirty):
+        # Modules are kept sorted, compare walks both versions in name order
+        dirty |= sort_module_list(self.modules)
+        if self.dirty is not None:
+            self.dirty |= dirty
+        self.changed = True
+
+    def merge(self, records, odoo_version):
+        # records are (name, author, version data) tuples like read_csv_records
+        self.mark_changed(merge_modules(self.modules, records, odoo_version))
+
+    def import_csv(self, input_file, odoo_version):
+        with open_csv(input_file) as csv_file:
+            self.merge(read_csv_records(csv_file), odoo_version)
+
+    def import_batch(self, imports, jobs=None):
+        # CSV files of the same version are merged like one concatenated
+        # export, returns the imported versions
+        records_by_version = {}
+        results = read_csv_files([input_file for input_file, odoo_version in imports], jobs)
+        for (input_file, odoo_version), records in zip(imports, results):
+            records_by_version.setdefault(odoo_version, []).extend(records)
+        for odoo_version, records in records_by_version.items():
+            self.merge(records, odoo_version)
+        return list(records_by_version)
+
+    def import_db(self, dsn, odoo_version, cursor=None, batch_size=DB_BATCH_SIZE):
+        connection = None
+        try:
+            if cursor is None:
+                connection, cursor = open_db_cursor(dsn)
+            self.merge(fetch_db_records(cursor, batch_size), odoo_version)
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def scan_addons(self, odoo_version, addons_paths, all_modules=False, jobs=None):
+        records = manifest_records(scan_manifests(addons_paths, jobs), odoo_version)
+        if self.modules and not all_modules:
+            # Only the availability of the modules of the database is of interest
+            known_names = {module.name for module in self.modules}
+            records = (record for record in records if record[0] in known_names)
+        self.merge(records, odoo_version)
+
+    def add_version(self, odoo_version):
+        # Pre-populate state, auto_install, evaluation and comment
+        odoo_version = version_key(odoo_version)
+        for module in self.modules:
+            module.versions[odoo_version] = VersionRecord()
+        # Every module changes, so the whole file is re-emitted
+        self.dirty = None
+        self.mark_changed(set())
+
+    def remove_version(self, odoo_version):
+        dirty = set()
+        for module in self.modules:
+            if odoo_version in module.versions:
+                del module.versions[odoo_version]
+                dirty.add(module.name)
+        self.mark_changed(dirty)
+
+    def analyse_groups(self, odoo_version, author_filter=None, use_cache=False):
+        return group_modules(self.modules, odoo_version, author_filter)
+
+    def version_sides(self, odoo_versions, author_filter=None, use_cache=False):
+        return [version_side(self.modules, odoo_version, author_filter) for odoo_version in odoo_versions]
+
+    def analyse_matrix(self, odoo_versions=None, author_filter=None, use_cache=False):
+        if odoo_versions is None:
+            odoo_versions = collect_versions(self.modules)
+        return odoo_versions, module_matrix(self.modules, odoo_versions, author_filter)
+
+    def analyse(self, odoo_version, include_authors=None, exclude_authors=None, output_format='text', output=None, addons_paths=None):
+        analyse(self, odoo_version, include_authors, exclude_authors, False, output_format, output, addons_paths)
+
+    def analyse_versions(self, odoo_versions=None, include_authors=None, exclude_authors=None, output_format='text', output=None):
+        analyse_versions(self, odoo_versions, include_authors, exclude_authors, False, output_format, output)
+
+    def compare(self, source_version, target_version, include_authors=None, exclude_authors=None, output_format='text', output=None,
+                against=None, fields=None, changes=None):
+        compare_versions(self, source_version, target_version, False, include_authors, exclude_authors, output_format, output,
+                         against, fields, changes)
+
+    def save(self):
+        if self.changed:
+            self.storage.save_model(self.modules, self.dirty)
+            self.changed = False
 
-                else:
-                    print(f"Skipping row {i}: {row}. It doesn't have enough columns.")
-            else:
-                print(f"Skipping row {i}: {row}. It contains the pattern '(<number> rows)'.")
 
+def open_database(path, tenant=None):
+    # Reports accept an open ModuleDB instead of a path
+    if isinstance(path, ModuleDB):
+        return path
+    return open_storage(path, tenant=tenant)
+
+
+# Manifest file names, __openerp__.py is used up to Odoo 9.0
+MANIFEST_FILES = ('__manifest__.py', '__openerp__.py')
+
+# Parsed manifests by path, with the mtime they were read at
+manifest_cache = {}
+
+
+def find_manifests(addons_path):
+    # (module name, manifest path) of all modules in an addons directory
+    manifests = []
+    with os.scandir(addons_path) as entries:
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            if not entry.is_dir() or entry.name.startswith('.'):
+                continue
+            for manifest_file in MANIFEST_FILES:
+                manifest_path = os.path.join(entry.path, manifest_file)
+                if os.path.isfile(manifest_path):
+                    manifests.append((entry.name, manifest_path))
+                    break
+    return manifests
+
+
+def read_manifest(manifest_path):
+    # Manifests are a dict literal, reading them doesn't execute any code.
+    # Returns None for manifests which can't be parsed.
+    mtime = os.stat(manifest_path).st_mtime_ns
+    cached = manifest_cache.get(manifest_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    import ast
     try:
-        with open(output_file, 'r') as existing_yaml_file:
-            existing_data = yaml.safe_load(existing_yaml_file)
-            if existing_data is None:
-                existing_data = []
-
-        # Track which modules were found in the CSV
-        csv_module_names = set(data_dict.keys())
-
-        for name, new_data in data_dict.items():
-            index = next((i for i, item in enumerate(existing_data) if item['name'] == name), None)
-            if index is not None:
-                new_data[odoo_version]["evaluation"] = existing_data[index].get(odoo_version, {}).get("evaluation", "")
-                new_data[odoo_version]["comment"] = existing_data[index].get(odoo_version, {}).get("comment", "")
-                existing_data[index].setdefault(odoo_version, {}).update(new_data[odoo_version])
-            else:
-                existing_data.append(new_data)
-
-        # Handle modules that exist in YAML but not in CSV - set their state to "not installed"
-        for entry in existing_data:
-            entry_name = entry.get('name')
-            if entry_name and entry_name not in csv_module_names:
-                # Module exists in YAML but not in CSV, set state to "not installed"
-                # Check for both string and numeric version keys to handle YAML parsing variations
-                version_key = None
-                for key in entry.keys():
-                    if str(key) == odoo_version:
-                        version_key = key
-                        break
-                
-                if version_key:
-                    entry[version_key]['state'] = 'not installed'
-                else:
-                    # If the version doesn't exist, create it with "not installed" state
-                    entry[odoo_version] = {
-                        'state': 'not installed',
-                        'auto_install': '',
-                        'evaluation': '',
-                        'comment': ''
-                    }
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = ast.literal_eval(f.read())
+        if not isinstance(manifest, dict):
+            manifest = None
+    except (ValueError, SyntaxError, UnicodeDecodeError):
+        manifest = None
+    manifest_cache[manifest_path] = (mtime, manifest)
+    return manifest
 
-        # Sort entries alphabetically by name and sort version keys within each entry
-        existing_data.sort(key=lambda x: x.get('name', ''))
-        for entry in existing_data:
-            # Sort version keys with highest version first
-            version_keys = [k for k in entry.keys() if k not in ['name', 'author']]
-            version_keys.sort(key=lambda x: [int(i) for i in str(x).split('.')], reverse=True)
-            
-            # Reorder the entry dictionary
-            ordered_entry = {'name': entry['name'], 'author': entry['author']}
-            for version in version_keys:
-                ordered_entry[version] = entry[version]
-            entry.clear()
-            entry.update(ordered_entry)
 
-        with open(output_file, 'w') as yaml_file:
-            yaml.dump(existing_data, yaml_file, default_flow_style=False, sort_keys=False, width=float('inf'))
+def scan_manifests(addons_paths, jobs=None):
+    # Manifests by module name. Listing and reading is I/O bound, so both are
+    # done in a thread pool. A module found in several addons paths is taken
+    # from the first one, like Odoo does. The addons paths may also be given
+    # comma separated like Odoo's --addons-path.
+    import concurrent.futures
+    addons_paths = [path for addons_path in addons_paths for path in addons_path.split(',') if path]
+    for addons_path in addons_paths:
+        if not os.path.isdir(addons_path):
+            raise ValueError(f"Addons path {addons_path} not found.")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        manifests = [manifest for found in executor.map(find_manifests, addons_paths) for manifest in found]
+        results = executor.map(read_manifest, [manifest_path for name, manifest_path in manifests])
+        modules = {}
+        for (name, manifest_path), manifest in zip(manifests, results):
+            if manifest is not None:
+                modules.setdefault(name, manifest)
+    return modules
 
-        print(f"Data appended/merged to {output_file} successfully.")
-    except FileNotFoundError:
-        with open(output_file, 'w') as yaml_file:
-            yaml.dump([data for name, data in data_dict.items()], yaml_file, default_flow_style=False, sort_keys=False, width=float('inf'))
-        print(f"{output_file} not found. Created a new file with the data.")
+
+def dependency_order(depends):
+    # Topological order of the modules, dependencies first (Kahn's algorithm).
+    # Modules in dependency cycles are appended at the end.
+    dependents = {}
+    pending = {}
+    for name, module_depends in depends.items():
+        pending[name] = 0
+        for dependency in set(module_depends):
+            if dependency in depends:
+                pending[name] += 1
+                dependents.setdefault(dependency, []).append(name)
+    order = [name for name, count in pending.items() if not count]
+    for name in order:
+        for dependent in dependents.get(name, ()):
+            pending[dependent] -= 1
+            if not pending[dependent]:
+                order.append(dependent)
+    if len(order) < len(pending):
+        ordered = set(order)
+        order.extend(name for name in pending if name not in ordered)
+    return order
+
+
+def transitive_blockers(depends, installed):
+    # Not installed direct and indirect dependencies of every module, computed
+    # in one pass over the topological order
+    blockers = {}
+    for name in dependency_order(depends):
+        missing = set()
+        for dependency in depends[name]:
+            if dependency not in installed:
+                missing.add(dependency)
+            missing |= blockers.get(dependency, set())
+        blockers[name] = missing
+    return blockers
+
+
+def dependency_report(side, manifests, author_filter=None):
+    # Returns the required modules blocked by not installed dependencies and
+    # the not installed modules which would be installed automatically
+    # together with the required modules, side is the data of one version
+    # (see version_side)
+    version_data = {name: data for name, author, data in side}
+    depends = {name: list(manifest.get('depends') or []) for name, manifest in manifests.items()}
+    for name in version_data:
+        depends.setdefault(name, [])
+    for module_depends in list(depends.values()):
+        for dependency in module_depends:
+            depends.setdefault(dependency, [])
+    installed = {name for name, data in version_data.items() if data.get('state') == 'installed'}
+    required = [
+        (name, author) for name, author, data in side
+        if data.get('evaluation') == 'required' and (not author_filter or author_filter(author))
+    ]
+
+    blockers = transitive_blockers(depends, installed)
+    blocked = [(name, sorted(blockers[name])) for name, author in required if blockers[name]]
+
+    # Modules installed with the required ones, auto_install modules follow
+    # once all their dependencies are installed
+    to_install = set(installed)
+    for name, author in required:
+        to_install.add(name)
+        to_install |= blockers[name]
+    auto_installed = []
+    for name in dependency_order(depends):
+        auto_install = manifests.get(name, {}).get('auto_install') or version_data.get(name, {}).get('auto_install') == 't'
+        # Since Odoo 16.0 auto_install may list the triggering dependencies
+        triggers = auto_install if isinstance(auto_install, list) else depends[name]
+        if name not in to_install and auto_install and triggers and all(d in to_install for d in triggers):
+            to_install.add(name)
+            auto_installed.append(name)
+    auto_installed = [name for name in auto_installed if name not in installed]
+    return blocked, auto_installed
+
+
+def manifest_records(manifests, odoo_version):
+    # Records like read_csv_records for the installable modules of a version,
+    # modules with a manifest version of another series aren't migrated yet
+    series = f"{version_key(odoo_version)}."
+    for name, manifest in sorted(manifests.items()):
+        if not manifest.get('installable', True):
+            continue
+        module_version = str(manifest.get('version', ''))
+        if module_version.count('.') >= 4 and not module_version.startswith(series):
+            continue
+        auto_install = 't' if manifest.get('auto_install') else 'f'
+        yield name, manifest.get('author') or '', {'state': 'installed', 'auto_install': auto_install}
+
+
+def scan_addons(output_file, odoo_version, addons_paths, all_modules=False, jobs=None):
+    # Merge the modules available in the addons paths into a version, like an
+    # import of a database with these modules installed
+    try:
+        db = ModuleDB(output_file)
+        db.scan_addons(odoo_version, addons_paths, all_modules, jobs)
+        db.save()
+
+        if db.created:
+            print(f"{output_file} not found. Created a new file with the modules of the addons paths.")
+        else:
+            print(f"Merged the modules of the addons paths to {output_file} successfully.")
     except Exception as e:
         print(f"An error occurred: {e}")
 
 
-def compare_versions(yaml_file, source_version, target_version):
-    with open(yaml_file, 'r') as yaml_file:
-        data = yaml.safe_load(yaml_file)
+# Machine-readable output formats of analyse and compare
+OUTPUT_FORMATS = ['text', 'json', 'csv', 'ndjson']
 
-    if not isinstance(data, list):
-        print("Error: YAML file must contain a list of dictionaries.")
-        return
 
-    for entry in data:
-        name = entry.get('name')
-        if name:
-            source_data = entry.get(source_version)
-            target_data = entry.get(target_version)
+def open_output(output=None):
+    if output is None or output == '-':
+        return contextlib.nullcontext(sys.stdout)
+    return open(output, 'w', newline='')
+
+
+def write_records(records, fields, output_format, output=None):
+    # Stream records one at a time, so large reports are written while they
+    # are computed instead of being collected first
+    with open_output(output) as stream:
+        if output_format == 'csv':
+            import csv
+            writer = csv.DictWriter(stream, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(records)
+        elif output_format == 'ndjson':
+            for record in records:
+                stream.write(json.dumps(record) + '\n')
+        elif output_format == 'json':
+            separator = '\n'
+            stream.write('[')
+            for record in records:
+                stream.write(separator + json.dumps(record))
+                separator = ',\n'
+            stream.write('\n]\n' if separator != '\n' else ']\n')
+        else:
+            raise ValueError(f"Unknown output format '{output_format}'.")
 
-            if source_data and target_data:
-                if source_data.get('state') != target_data.get('state'):
-                    print(f"Name: {name}, State in {source_version}: {source_data.get('state')}, State in {target_version}: {target_data.get('state')}")
 
+def diff_record(change, name, source_item, target_item, changed_fields, fields):
+    record = {'name': name, 'change': change, 'changed_fields': ' '.join(changed_fields)}
+    for field in fields:
+        record[f'source_{field}'] = diff_value(source_item, field)
+        record[f'target_{field}'] = diff_value(target_item, field)
+    return record
 
-def add_version(yaml_file_path, odoo_version):
+
+def compare_versions(yaml_file, source_version, target_version, use_cache=True, include_authors=None, exclude_authors=None,
+                     output_format='text', output=None, against=None, fields=None, changes=None, tenant=None):
+    # Compare two versions of one module database, or with against a version
+    # of yaml_file with a version of another module database
     try:
-        with open(yaml_file_path, 'r') as yaml_file:
-            data = yaml.safe_load(yaml_file)
+        author_filter = AuthorFilter(include_authors, exclude_authors)
+        fields = fields or DIFF_FIELDS
+        changes = changes or DIFF_CHANGES
+        if against:
+            source, = open_database(yaml_file, tenant).version_sides([source_version], author_filter, use_cache)
+            target, = open_database(against).version_sides([target_version], author_filter, use_cache)
+            source_label, target_label = f"{yaml_file} {source_version}", f"{against} {target_version}"
+        else:
+            source, target = open_database(yaml_file, tenant).version_sides([source_version, target_version], author_filter, use_cache)
+            source_label, target_label = source_version, target_version
+        differences = (difference for difference in diff_modules(source, target, fields) if difference[0] in changes)
 
-        if not isinstance(data, list):
-            print("Error: YAML file must contain a list of dictionaries.")
+        if output_format != 'text':
+            record_fields = ['name', 'change', 'changed_fields'] + [f'{side}_{field}' for field in fields for side in ('source', 'target')]
+            write_records((diff_record(*difference, fields) for difference in differences), record_fields, output_format, output)
             return
 
-        # Define the keys to pre-populate
-        keys_to_prepopulate = ['state', 'auto_install', 'evaluation', 'comment']
+        counts = dict.fromkeys(DIFF_CHANGES, 0)
+        field_counts = dict.fromkeys(fields, 0)
+        for change, name, source_item, target_item, changed_fields in differences:
+            counts[change] += 1
+            if change == 'added':
+                print(f"Added: {name} (only in {target_label})")
+            elif change == 'removed':
+                print(f"Removed: {name} (only in {source_label})")
+            else:
+                details = ', '.join(f"{field} {diff_value(source_item, field)!r} -> {diff_value(target_item, field)!r}" for field in changed_fields)
+                print(f"Changed: {name}: {details}")
+                for field in changed_fields:
+                    field_counts[field] += 1
 
-        for entry in data:
-            entry[odoo_version] = {key: '' for key in keys_to_prepopulate}
+        summary = ', '.join(f"{counts[change]} {change}" for change in changes)
+        field_summary = ', '.join(f"{field}: {count}" for field, count in field_counts.items())
+        print(f"Summary {source_label} -> {target_label}: {summary} ({field_summary})")
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}")
 
-        # Sort entries alphabetically by name and sort version keys within each entry
-        data.sort(key=lambda x: x.get('name', ''))
-        for entry in data:
-            # Sort version keys with highest version first
-            version_keys = [k for k in entry.keys() if k not in ['name', 'author']]
-            version_keys.sort(key=lambda x: [int(i) for i in str(x).split('.')], reverse=True)
-            
-            # Reorder the entry dictionary
-            ordered_entry = {'name': entry['name'], 'author': entry['author']}
-            for version in version_keys:
-                ordered_entry[version] = entry[version]
-            entry.clear()
-            entry.update(ordered_entry)
 
-        with open(yaml_file_path, 'w') as yaml_file:
-            yaml.dump(data, yaml_file, default_flow_style=False, sort_keys=False, width=float('inf'))
+def add_version(yaml_file_path, odoo_version, tenant=None):
+    try:
+        db = ModuleDB(yaml_file_path, tenant)
+        db.add_version(odoo_version)
+        db.save()
+
+        print(f"Added version '{version_key(odoo_version)}' with pre-populated keys to all entries in '{yaml_file_path}'.")
+    except ValueError as e:
+        print(f"Error: {e}")
+    except Exception as e:
+        print(f"An error occurred: {e}")
 
-        print(f"Added version '{odoo_version}' with pre-populated keys to all entries in '{yaml_file_path}'.")
+
+def remove_version(yaml_file_path, odoo_version, tenant=None):
+    try:
+        db = ModuleDB(yaml_file_path, tenant)
+        db.remove_version(odoo_version)
+        db.save()
+
+        print(f"Removed version '{odoo_version}' from all entries in '{yaml_file_path}'.")
+    except ValueError as e:
+        print(f"Error: {e}")
     except Exception as e:
         print(f"An error occurred: {e}")
 
 
-def remove_version(yaml_file_path, odoo_version):
+def convert(source, target, prefix_length=None):
     try:
-        with open(yaml_file_path, 'r') as yaml_file:
-            data = yaml.safe_load(yaml_file)
+        target_storage = open_storage(target, prefix_length)
+        if target_storage.exists():
+            print(f"Error: {target} already exists.")
+            return
 
+        data = open_storage(source).load()
+        if data is None:
+            data = []
         if not isinstance(data, list):
             print("Error: YAML file must contain a list of dictionaries.")
             return
 
-        for entry in data:
-            entry.pop(odoo_version, None)
-
-        # Sort entries alphabetically by name and sort version keys within each entry
-        data.sort(key=lambda x: x.get('name', ''))
-        for entry in data:
-            # Sort version keys with highest version first
-            version_keys = [k for k in entry.keys() if k not in ['name', 'author']]
-            version_keys.sort(key=lambda x: [int(i) for i in str(x).split('.')], reverse=True)
-            
-            # Reorder the entry dictionary
-            ordered_entry = {'name': entry['name'], 'author': entry['author']}
-            for version in version_keys:
-                ordered_entry[version] = entry[version]
-            entry.clear()
-            entry.update(ordered_entry)
-
-        with open(yaml_file_path, 'w') as yaml_file:
-            yaml.dump(data, yaml_file, default_flow_style=False, sort_keys=False, width=float('inf'))
+        sort_modules(data)
+        target_storage.save(data)
 
-        print(f"Removed version '{odoo_version}' from all entries in '{yaml_file_path}'.")
+        print(f"Converted {len(data)} modules from {source} to {target}.")
     except Exception as e:
         print(f"An error occurred: {e}")
 
 
-def analyse(yaml_file, odoo_version, include_authors=None, exclude_authors=None):
-    try:
-        with open(yaml_file, 'r') as existing_yaml_file:
-            existing_data = yaml.safe_load(existing_yaml_file)
-            if existing_data is None:
-                existing_data = []
-
-        # Dictionary to group modules by their state
-        state_groups = {
-            'Not evaluated': [],
-            'Required but not installed': [],
-            'Desired but not installed': [],
-            'Not desired but installed': [],
-            'Not required but installed': []
-        }
-        
-        required_and_migrated_count = 0
-
-        for entry in existing_data:
-            entry_data = entry.get(odoo_version, {})
-            state = entry_data.get('state', '')
-            evaluation = entry_data.get('evaluation', '')
-            name = entry.get('name', '')
-            author = entry.get('author', '')
-
-            # Apply author filtering
-            if include_authors:
-                # Check if any of the include_authors is found in the author field (case-insensitive, partial match)
-                if not any(inc_author.lower() in author.lower() for inc_author in include_authors):
-                    continue
-            
-            if exclude_authors:
-                # Check if any of the exclude_authors is found in the author field (case-insensitive, partial match)
-                if any(exc_author.lower() in author.lower() for exc_author in exclude_authors):
-                    continue
+def analyse(yaml_file, odoo_version, include_authors=None, exclude_authors=None, use_cache=True, output_format='text', output=None, addons_paths=None,
+            tenant=None):
+    if output_format != 'text':
+        if addons_paths:
+            print("Error: --addons-path is only supported with the text format.")
+            return
+        analyse_versions(yaml_file, [odoo_version], include_authors, exclude_authors, use_cache, output_format, output, tenant)
+        return
 
-            if not evaluation:
-                state_groups['Not evaluated'].append(name)
-            elif state == 'not installed':
-                if evaluation == 'required':
-                    state_groups['Required but not installed'].append(name)
-                elif evaluation == 'desired':
-                    state_groups['Desired but not installed'].append(name)
-            elif state == 'installed':
-                if evaluation == 'not desired':
-                    state_groups['Not desired but installed'].append(name)
-                elif evaluation == 'not required':
-                    state_groups['Not required but installed'].append(name)
-                elif evaluation == 'required':
-                    required_and_migrated_count += 1
+    try:
+        author_filter = AuthorFilter(include_authors, exclude_authors)
+        # Scanned first so that a wrong addons path fails before any output
+        manifests = scan_manifests(addons_paths) if addons_paths else None
+        storage = open_database(yaml_file, tenant)
+        state_groups, required_and_migrated_count = storage.analyse_groups(
+            odoo_version, author_filter, use_cache
+        )
 
         # Print grouped results with better formatting and colors
         for state_name, modules in state_groups.items():
             if modules:  # Only print if there are modules in this state
                 # Sort modules alphabetically
                 modules.sort()
-                
-                # Color codes for different states
-                if state_name == 'Not evaluated':
-                    color = '\033[93m'  # Yellow
-                elif state_name == 'Required but not installed':
-                    color = '\033[91m'  # Red
-                elif state_name == 'Desired but not installed':
-                    color = '\033[94m'  # Blue
-                elif state_name == 'Not desired but installed':
-                    color = '\033[95m'  # Magenta
-                elif state_name == 'Not required but installed':
-                    color = '\033[96m'  # Cyan
-                else:
-                    color = '\033[0m'   # Default
-                
-                reset_color = '\033[0m'  # Reset color
-                
+
+                color = STATE_COLORS.get(state_name, RESET_COLOR)
+
                 # Print status with module count on its own line with color
                 module_count = len(modules)
-                print(f"{color}{state_name}: {module_count} modules{reset_color}")
-                
+                print(f"{color}{state_name}: {module_count} modules{RESET_COLOR}")
+
                 # Print modules indented on the same line, separated by spaces
                 modules_str = ' '.join(modules)
                 print(f"  {modules_str}")
                 print()  # Empty line for better separation
 
         if required_and_migrated_count > 0:
-            color = '\033[92m'  # Green
-            reset_color = '\033[0m'
-            print(f"{color}Required and migrated modules:{reset_color}")
+            color = STATE_COLORS[REQUIRED_AND_MIGRATED]
+            print(f"{color}Required and migrated modules:{RESET_COLOR}")
             print(f"  └─ {required_and_migrated_count} modules")
 
+        if addons_paths:
+            # Dependencies may belong to any author, so all modules are loaded
+            side, = storage.version_sides([odoo_version], None, use_cache)
+            blocked, auto_installed = dependency_report(side, manifests, author_filter)
+            color = STATE_COLORS['Required but not installed']
+            if blocked:
+                print()
+                print(f"{color}Required but blocked by not installed dependencies: {len(blocked)} modules{RESET_COLOR}")
+                for name, blockers in blocked:
+                    print(f"  {name} blocked by {' '.join(blockers)}")
+            if auto_installed:
+                print()
+                print(f"{color}Not installed but auto installed with required modules: {len(auto_installed)} modules{RESET_COLOR}")
+                print(f"  {' '.join(auto_installed)}")
+
+    except ValueError as e:
+        print(f"Error: {e}")
     except FileNotFoundError:
         print(f"Error: {yaml_file} not found.")
     except Exception as e:
         print(f"An error occurred: {e}")
 
 
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='Process CSV data and append to a YAML file.')
-    subparsers = parser.add_subparsers(dest='command')
+def analyse_versions(yaml_file, odoo_versions=None, include_authors=None, exclude_authors=None, use_cache=True, output_format='text', output=None,
+                     tenant=None):
+    try:
+        author_filter = AuthorFilter(include_authors, exclude_authors)
+        odoo_versions, rows = open_database(yaml_file, tenant).analyse_matrix(odoo_versions, author_filter, use_cache)
+
+        if output_format != 'text':
+            # One record per module with its state group per version
+            fields = ['name', 'author'] + [str(odoo_version) for odoo_version in odoo_versions]
+            write_records((dict(zip(fields, [name, author, *groups])) for name, author, groups in rows), fields, output_format, output)
+            return
+
+        rows = list(rows)
+        if not odoo_versions:
+            print("No versions found.")
+            return
 
-    # Subparser for --import-csv
-    import_parser = subparsers.add_parser('import-csv')
-    import_parser.add_argument('input_csv_file', help='Input CSV file')
-    import_parser.add_argument('output_yaml_file', help='Output YAML file')
-    import_parser.add_argument('odoo_version', help='Odoo version')
-
-    # Subparser for --compare
-    compare_parser = subparsers.add_parser('compare')
-    compare_parser.add_argument('yaml_file', help='YAML file')
-    compare_parser.add_argument('source_version', help='Source version')
-    compare_parser.add_argument('target_version', help='Target version')
-
-    # Subparser for --add-version
-    add_version_parser = subparsers.add_parser('add-version')
-    add_version_parser.add_argument('yaml_file', help='YAML file')
-    add_version_parser.add_argument('odoo_version', help='Odoo version to add')
-
-    # Subparser for --remove-version
-    remove_version_parser = subparsers.add_parser('remove-version')
-    remove_version_parser.add_argument('yaml_file', help='YAML file')
-    remove_version_parser.add_argument('odoo_version', help='Odoo version to remove')
-
-    # Subparser for --analyse
-    analyse_parser = subparsers.add_parser('analyse')
-    analyse_parser.add_argument('yaml_file', help='YAML file')
-    analyse_parser.add_argument('odoo_version', help='Odoo version to analyse')
-    analyse_parser.add_argument('--include-authors', nargs='+', help='Include only modules from these authors (space-separated list)')
-    analyse_parser.add_argument('--exclude-authors', nargs='+', help='Exclude modules from these authors (space-separated list)')
+        name_width = max([len('Module')] + [len(name) for name, author, groups in rows])
+        column_width = max([len(str(v)) for v in odoo_versions] + [len(code) for code in STATE_CODES.values()]) + 2
+        header = ''.join(str(odoo_version).rjust(column_width) for odoo_version in odoo_versions)
+
+        # Module counts per state and version
+        counts = {state_name: [0] * len(odoo_versions) for state_name in STATE_CODES}
+        for name, author, groups in rows:
+            for i, group in enumerate(groups):
+                if group is not None:
+                    counts[group][i] += 1
+
+        label_width = max(name_width, max(len(state_name) for state_name in STATE_CODES))
+        print(f"{'State':<{label_width}}{header}")
+        for state_name, state_counts in counts.items():
+            color = STATE_COLORS[state_name]
+            print(f"{color}{state_name:<{label_width}}{''.join(str(count).rjust(column_width) for count in state_counts)}{RESET_COLOR}")
+        print()
+
+        # Module x version matrix, modules without any state are skipped
+        print(f"{'Module':<{label_width}}{header}")
+        for name, author, groups in sorted(rows):
+            if not any(groups):
+                continue
+            cells = []
+            for group in groups:
+                code = STATE_CODES.get(group, '-').rjust(column_width)
+                cells.append(f"{STATE_COLORS[group]}{code}{RESET_COLOR}" if group else code)
+            print(f"{name:<{label_width}}{''.join(cells)}")
+        print()
+
+        print('  '.join(f"{code}: {state_name}" for state_name, code in STATE_CODES.items()))
+
+    except FileNotFoundError:
+        print(f"Error: {yaml_file} not found.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+def analyse_tenants(fleet_path, odoo_version, include_authors=None, exclude_authors=None, use_cache=True, output_format='text', output=None):
+    # Analyse all tenants of a fleet in one pass, the catalog is loaded once
+    # and only one tenant is held in memory at a time
+    try:
+        author_filter = AuthorFilter(include_authors, exclude_authors)
+        storage = FleetStorage(fleet_path)
+        catalog = storage.load_catalog(use_cache)
+        odoo_version = version_key(odoo_version)
+
+        def rows():
+            for tenant in storage.tenants():
+                view = modules_from_data(storage.tenant_view(catalog, storage.read_tenant(tenant)))
+                for name, author, (group,) in module_matrix(view, [odoo_version], author_filter):
+                    yield tenant, name, author, group
+
+        if output_format != 'text':
+            fields = ['tenant', 'name', 'author', str(odoo_version)]
+            write_records((dict(zip(fields, row)) for row in rows()), fields, output_format, output)
+            return
+
+        # Module counts per tenant and state, and tenants per module and state
+        counts = {}
+        tenants_by_module = {state_name: {} for state_name in STATE_CODES}
+        for tenant, name, author, group in rows():
+            tenant_counts = counts.setdefault(tenant, dict.fromkeys(STATE_CODES, 0))
+            if group is not None:
+                tenant_counts[group] += 1
+                tenants_by_module[group][name] = tenants_by_module[group].get(name, 0) + 1
+
+        if not counts:
+            print(f"No tenants found in {fleet_path}.")
+            return
+
+        tenant_width = max([len('Tenant')] + [len(tenant) for tenant in counts])
+        column_width = max(len(code) for code in STATE_CODES.values()) + 2
+        print(f"{'Tenant':<{tenant_width}}{''.join(code.rjust(column_width) for code in STATE_CODES.values())}")
+        for tenant, tenant_counts in counts.items():
+            print(f"{tenant:<{tenant_width}}{''.join(str(count).rjust(column_width) for count in tenant_counts.values())}")
+        print()
+
+        for state_name in STATE_GROUPS:
+            modules = tenants_by_module[state_name]
+            if modules:
+                color = STATE_COLORS.get(state_name, RESET_COLOR)
+                print(f"{color}{state_name}: {len(modules)} modules{RESET_COLOR}")
+                print('  ' + ' '.join(f"{name} ({count})" for name, count in sorted(modules.items())))
+                print()
+
+        print('  '.join(f"{code}: {state_name}" for state_name, code in STATE_CODES.items()))
+        print("The number of tenants is given in parentheses.")
+    except FileNotFoundError:
+        print(f"Error: {fleet_path} not found.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+# Seconds between polls of the watched file, and seconds without further
+# writes before a change is handled, editors often save in several steps
+WATCH_INTERVAL = 0.5
+WATCH_DEBOUNCE = 0.3
+CLEAR_SCREEN = '\033[2J\033[H'
+
+
+def watch_files(path):
+    # All files of a module database, sharded databases are directories
+    if not os.path.isdir(path):
+        return [path]
+    files = []
+    for directory, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        files.extend(os.path.join(directory, filename) for filename in sorted(filenames) if not filename.startswith('.'))
+    return files
+
+
+def watch_signature(path):
+    # Cheap stat based signature, polled until it changes
+    signature = []
+    for file_path in watch_files(path):
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            continue
+        signature.append((file_path, stat.st_mtime_ns, stat.st_size))
+    return signature
+
+
+def content_digest(path):
+    import hashlib
+    digest = hashlib.sha256()
+    for file_path in watch_files(path):
+        try:
+            with open(file_path, 'rb') as f:
+                digest.update(file_path.encode() + b'\0' + f.read())
+        except FileNotFoundError:
+            continue
+    return digest.hexdigest()
+
+
+def watch_changes(path, interval=WATCH_INTERVAL, debounce=WATCH_DEBOUNCE):
+    # Yield the content digest initially and after every change of the content.
+    # Saves that don't change the content, e.g. touching the file, are skipped.
+    digest = None
+    while True:
+        signature = watch_signature(path)
+        current_digest = content_digest(path)
+        if current_digest != digest:
+            digest = current_digest
+            yield digest
+
+        while watch_signature(path) == signature:
+            time.sleep(interval)
+
+        # Wait until the writes have settled
+        signature = watch_signature(path)
+        while True:
+            time.sleep(debounce)
+            current_signature = watch_signature(path)
+            if current_signature == signature:
+                break
+            signature = current_signature
 
-    parser.add_argument('--version', action='version', version='%(prog)s {}'.format(VERSION))
 
-    args = parser.parse_args()
+def watch(path, render, output_format='text', output=None, interval=WATCH_INTERVAL, debounce=WATCH_DEBOUNCE):
+    # Re-render whenever the module database changed, until interrupted
+    try:
+        for digest in watch_changes(path, interval, debounce):
+            if output_format == 'text' and output is None:
+                print(CLEAR_SCREEN, end='')
+            render()
+            if output_format == 'text' and output is None:
+                print(f"\nWatching {path} for changes, press Ctrl+C to stop.", flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+HISTORY_CACHE_SUFFIX = 'omm-history'
+HISTORY_FIELDS = ['commit', 'date', 'version'] + list(STATE_CODES)
+
+
+def run_git(directory, *args):
+    import subprocess
+    return subprocess.run(['git', '-C', directory or '.', *args], capture_output=True, check=True).stdout
+
+
+def git_file_revisions(yaml_file_path):
+    # (commit, commit date, blob) of every commit changing the file, oldest
+    # first. The blob id is git's hash of the file content, so revisions with
+    # the same content share it.
+    directory, filename = os.path.split(os.path.abspath(yaml_file_path))
+    output = run_git(directory, 'log', '--format=commit %H %cI', '--raw', '--no-abbrev', '--no-renames', '--', filename)
+    revisions = []
+    commit = None
+    for line in output.decode().splitlines():
+        if line.startswith('commit '):
+            commit = line.split()[1:3]
+        elif line.startswith(':') and commit:
+            blob, status = line.split('\t', 1)[0].split()[3:5]
+            # Commits deleting the file have no content to analyse
+            if status != 'D':
+                revisions.append((*commit, blob))
+            commit = None
+    revisions.reverse()
+    return revisions
+
+
+def history_counts(directory, blob):
+    # Module counts per analyse group and version of one revision, None if the
+    # revision can't be parsed
+    import yaml
+    try:
+        modules = modules_from_data(normalize_modules(yaml.load(run_git(directory, 'cat-file', 'blob', blob), Loader=yaml_loader()) or []))
+    except (yaml.YAMLError, AttributeError, TypeError, ValueError):
+        return None
+    odoo_versions = collect_versions(modules)
+    counts = {str(odoo_version): dict.fromkeys(STATE_CODES, 0) for odoo_version in odoo_versions}
+    for name, author, groups in module_matrix(modules, odoo_versions):
+        for odoo_version, group in zip(odoo_versions, groups):
+            if group is not None:
+                counts[str(odoo_version)][group] += 1
+    return counts
+
+
+def history_cache_header():
+    # Counts are discarded when written by another omm version since the
+    # classification may have changed
+    return f"omm-history {VERSION}\n".encode()
+
+
+def load_history_cache(cache_file):
+    # Counts per blob id
+    counts = read_cache(cache_file, history_cache_header())
+    return counts if isinstance(counts, dict) else {}
+
+
+def save_history_cache(cache_file, counts):
+    write_cache(cache_file, history_cache_header(), counts)
+
+
+def history_records(yaml_file, odoo_versions=None, use_cache=True, jobs=None):
+    revisions = git_file_revisions(yaml_file)
+    cache_file = cache_path(yaml_file, HISTORY_CACHE_SUFFIX)
+    counts_by_blob = load_history_cache(cache_file) if use_cache else {}
+
+    # Every distinct content is parsed once, in parallel
+    directory = os.path.dirname(os.path.abspath(yaml_file))
+    blobs = sorted({blob for commit, date, blob in revisions if blob not in counts_by_blob})
+    if len(blobs) > 1 and jobs != 1:
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            counts_by_blob.update(zip(blobs, executor.map(functools.partial(history_counts, directory), blobs)))
+    else:
+        counts_by_blob.update((blob, history_counts(directory, blob)) for blob in blobs)
+    if use_cache and blobs:
+        save_history_cache(cache_file, counts_by_blob)
+
+    revisions = [(commit, date, counts_by_blob[blob]) for commit, date, blob in revisions if counts_by_blob[blob] is not None]
+    if odoo_versions is None:
+        odoo_versions = sorted({version_key(v) for commit, date, counts in revisions for v in counts}, key=lambda v: v.sort_key)
+    records = []
+    for odoo_version in odoo_versions:
+        for commit, date, counts in revisions:
+            version_counts = counts.get(str(odoo_version))
+            if version_counts is not None:
+                records.append({'commit': commit, 'date': date, 'version': str(odoo_version), **version_counts})
+    return records
+
+
+def history(yaml_file, odoo_versions=None, use_cache=True, jobs=None, output_format='text', output=None):
+    import subprocess
+    try:
+        records = history_records(yaml_file, odoo_versions, use_cache, jobs)
+
+        if output_format != 'text':
+            write_records(records, HISTORY_FIELDS, output_format, output)
+            return
+
+        if not records:
+            print(f"No revisions of {yaml_file} found.")
+            return
+
+        column_width = max(len(code) for code in STATE_CODES.values()) + 2
+        odoo_version = None
+        for record in records:
+            if record['version'] != odoo_version:
+                if odoo_version is not None:
+                    print()
+                odoo_version = record['version']
+                print(odoo_version)
+                print(f"{'Date':<25} {'Commit':<10}{''.join(code.rjust(column_width) for code in STATE_CODES.values())}")
+            counts = ''.join(str(record[state_name]).rjust(column_width) for state_name in STATE_CODES)
+            print(f"{record['date']:<25} {record['commit'][:10]:<10}{counts}")
+        print()
+
+        print('  '.join(f"{code}: {state_name}" for state_name, code in STATE_CODES.items()))
+    except subprocess.CalledProcessError as e:
+        print(f"Error: {e.stderr.decode().strip()}")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+SERVE_HOST = '127.0.0.1'
+SERVE_PORT = 8000
+
+# Queries answered by serve, e.g. /analyse?version=15.0&include_authors=oca
+# or /compare?source=12.0&target=15.0&only=changed
+SERVE_QUERIES = ['/versions', '/analyse', '/compare', '/modules/<name>']
+
+# Parameters read by each query, others like cache busters of dashboards
+# don't make a different answer
+SERVE_QUERY_PARAMETERS = {
+    '/analyse': ('version', 'include_authors', 'exclude_authors'),
+    '/compare': ('source', 'target', 'fields', 'only', 'include_authors', 'exclude_authors'),
+}
+
+
+class QueryService:
+    # The modules of a database kept in memory by serve. Answers are cached
+    # per revision (content digest) of the database and query, the modules
+    # are loaded again and the cache is dropped when the content changed.
+
+    def __init__(self, path, tenant=None):
+        self.path = path
+        self.storage = open_storage(path, tenant=tenant)
+        self.signature = None
+        self.revision = None
+        self.modules = []
+        self.responses = {}
+        import threading
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        # Stat the files on every query, the content is only hashed when
+        # they changed and only parsed when the content changed
+        signature = watch_signature(self.path)
+        if signature == self.signature:
+            return
+        revision = content_digest(self.path)
+        if revision != self.revision:
+            self.modules = self.storage.load_model(use_cache=True)
+            self.responses = {}
+            self.revision = revision
+        self.signature = signature
+
+    def query(self, path, params):
+        # Returns the revision and the JSON encoded answer, params are lists
+        # of values by name like parse_qs returns them
+        with self.lock:
+            self.refresh()
+            key = (path, tuple((name, tuple(params.get(name) or ())) for name in SERVE_QUERY_PARAMETERS.get(path, ())))
+            response = self.responses.get(key)
+            if response is None:
+                response = json.dumps(self.answer(path, params)).encode()
+                self.responses[key] = response
+            return self.revision, response
+
+    @staticmethod
+    def param(params, name):
+        values = params.get(name)
+        if not values:
+            raise ValueError(f"Missing parameter '{name}'.")
+        return values[-1]
+
+    @staticmethod
+    def choices(params, name, choices):
+        values = params.get(name) or choices
+        invalid = [value for value in values if value not in choices]
+        if invalid:
+            raise ValueError(f"Invalid {name} {', '.join(invalid)}, choose from {', '.join(choices)}.")
+        return values
+
+    def answer(self, path, params):
+        author_filter = AuthorFilter(params.get('include_authors'), params.get('exclude_authors'))
+        if path == '/versions':
+            return {'versions': [str(odoo_version) for odoo_version in collect_versions(self.modules)]}
+
+        if path == '/analyse':
+            odoo_version = version_key(self.param(params, 'version'))
+            state_groups, required_and_migrated_count = group_modules(self.modules, odoo_version, author_filter)
+            return {
+                'version': str(odoo_version),
+                'groups': {state_name: sorted(names) for state_name, names in state_groups.items()},
+                'required_and_migrated': required_and_migrated_count,
+            }
+
+        if path == '/compare':
+            source_version = version_key(self.param(params, 'source'))
+            target_version = version_key(self.param(params, 'target'))
+            fields = self.choices(params, 'fields', DIFF_FIELDS)
+            changes = self.choices(params, 'only', DIFF_CHANGES)
+            source, target = (version_side(self.modules, odoo_version, author_filter) for odoo_version in (source_version, target_version))
+            return {
+                'source': str(source_version),
+                'target': str(target_version),
+                'differences': [
+                    diff_record(*difference, fields) for difference in diff_modules(source, target, fields)
+                    if difference[0] in changes
+                ],
+            }
+
+        if path.startswith('/modules/'):
+            # The module with its data in all versions, highest version first
+            name = path[len('/modules/'):]
+            for module in self.modules:
+                if module.name == name:
+                    return {
+                        'name': module.name,
+                        'author': module.author,
+                        'versions': {
+                            str(odoo_version): record.to_dict() if isinstance(record, VersionRecord) else record
+                            for odoo_version, record in module.versions.items()
+                        },
+                    }
+            raise LookupError(f"Module {name} not found.")
+
+        raise LookupError(f"Unknown query {path}, use one of {', '.join(SERVE_QUERIES)}.")
+
+
+def make_server(service, host=SERVE_HOST, port=SERVE_PORT):
+    # The HTTP server is only imported by serve
+    import http.server
+    import urllib.parse
+
+    class QueryHandler(http.server.BaseHTTPRequestHandler):
+        # GET requests to the QueryService of the server
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            path = urllib.parse.unquote(url.path).rstrip('/')
+            try:
+                revision, body = self.server.service.query(path, urllib.parse.parse_qs(url.query))
+            except LookupError as e:
+                return self.send_json(404, {'error': str(e)})
+            except ValueError as e:
+                return self.send_json(400, {'error': str(e)})
+            except Exception as e:
+                return self.send_json(503, {'error': f"{self.server.service.path} can't be loaded: {e}"})
+
+            # Dashboards polling with If-None-Match only get the headers
+            etag = f'"{revision}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_json(200, body, etag)
+
+        def send_json(self, status, body, etag=None):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            if etag:
+                self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = http.server.ThreadingHTTPServer((host, port), QueryHandler)
+    server.service = service
+    return server
+
+
+def serve(path, host=SERVE_HOST, port=SERVE_PORT, tenant=None):
+    # Answer JSON queries until interrupted
+    try:
+        service = QueryService(path, tenant)
+        service.refresh()
+        server = make_server(service, host, port)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return
+    print(f"Serving {path} on http://{host}:{server.server_port}/, press Ctrl+C to stop.", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
+
+def run_command(args):
     if args.command == 'import-csv':
-        process_csv(args.input_csv_file, args.output_yaml_file, args.odoo_version)
+        process_csv(args.input_csv_file, args.output_yaml_file, args.odoo_version, args.tenant)
+    elif args.command == 'import-batch':
+        imports = list(args.imports)
+        if args.manifest:
+            imports.extend(read_import_manifest(args.manifest))
+        if imports:
+            import_batch(args.output_yaml_file, imports, args.jobs)
+        else:
+            print("Please provide CSV:VERSION pairs or a manifest file.")
+    elif args.command == 'import-db':
+        import_db(args.dsn, args.output_yaml_file, args.odoo_version, batch_size=args.batch_size)
+    elif args.command == 'scan-addons':
+        scan_addons(args.output_yaml_file, args.odoo_version, args.addons_paths, args.all, args.jobs)
     elif args.command == 'compare':
-        compare_versions(args.yaml_file, args.source_version, args.target_version)
+        compare_versions(args.yaml_file, args.source_version, args.target_version, not args.no_cache, args.include_authors, args.exclude_authors, args.format, args.output,
+                         args.against, args.fields, args.only, args.tenant)
     elif args.command == 'add-version':
-        add_version(args.yaml_file, args.odoo_version)
+        add_version(args.yaml_file, args.odoo_version, args.tenant)
     elif args.command == 'remove-version':
-        remove_version(args.yaml_file, args.odoo_version)
+        remove_version(args.yaml_file, args.odoo_version, args.tenant)
     elif args.command == 'analyse':
-        analyse(args.yaml_file, args.odoo_version, args.include_authors, args.exclude_authors)
+        if args.all_tenants and args.odoo_version:
+            render = functools.partial(analyse_tenants, args.yaml_file, args.odoo_version, args.include_authors, args.exclude_authors, not args.no_cache, args.format, args.output)
+        elif args.versions or args.all_versions:
+            odoo_versions = [version_key(v) for v in args.versions] if args.versions else None
+            render = functools.partial(analyse_versions, args.yaml_file, odoo_versions, args.include_authors, args.exclude_authors, not args.no_cache, args.format, args.output,
+                                       args.tenant)
+        elif args.odoo_version:
+            render = functools.partial(analyse, args.yaml_file, args.odoo_version, args.include_authors, args.exclude_authors, not args.no_cache, args.format, args.output,
+                                       args.addons_path, args.tenant)
+        else:
+            render = None
+            print("Please provide an Odoo version, --versions or --all-versions.")
+        if render and args.watch:
+            watch(args.yaml_file, render, args.format, args.output)
+        elif render:
+            render()
+    elif args.command == 'history':
+        odoo_versions = [version_key(v) for v in args.versions] if args.versions else None
+        history(args.yaml_file, odoo_versions, not args.no_cache, args.jobs, args.format, args.output)
+    elif args.command == 'serve':
+        serve(args.yaml_file, args.host, args.port, args.tenant)
+    elif args.command == 'convert':
+        convert(args.source, args.target, args.prefix_length)
+    elif args.command == 'cache' and args.cache_command == 'clear':
+        clear_cache(args.yaml_file)
     else:
         print("Please provide a valid command.")
+
+
+# Separates chained commands, e.g.
+#   omm.py import-csv installed.csv modules.yaml 12.0 + add-version modules.yaml 15.0 + analyse modules.yaml 15.0
+CHAIN_SEPARATOR = '+'
+
+# Commands which can be chained, they are applied to one ModuleDB per module
+# database which is saved after the last command
+CHAIN_COMMANDS = ['import-csv', 'import-batch', 'import-db', 'scan-addons', 'add-version', 'remove-version', 'analyse', 'compare']
+
+
+def split_chain(argv):
+    commands = [[]]
+    for arg in argv:
+        if arg == CHAIN_SEPARATOR:
+            commands.append([])
+        else:
+            commands[-1].append(arg)
+    return commands
+
+
+def database_key(path, tenant=None):
+    return os.path.abspath(path), tenant
+
+
+def run_database_command(db, args):
+    # Apply one chained command to an open ModuleDB
+    if args.command == 'import-csv':
+        db.import_csv(args.input_csv_file, args.odoo_version)
+    elif args.command == 'import-batch':
+        imports = list(args.imports)
+        if args.manifest:
+            imports.extend(read_import_manifest(args.manifest))
+        db.import_batch(imports, args.jobs)
+    elif args.command == 'import-db':
+        db.import_db(args.dsn, args.odoo_version, batch_size=args.batch_size)
+    elif args.command == 'scan-addons':
+        db.scan_addons(args.odoo_version, args.addons_paths, args.all, args.jobs)
+    elif args.command == 'add-version':
+        db.add_version(args.odoo_version)
+    elif args.command == 'remove-version':
+        db.remove_version(args.odoo_version)
+    elif args.command == 'compare':
+        db.compare(args.source_version, args.target_version, args.include_authors, args.exclude_authors, args.format, args.output,
+                   args.against, args.fields, args.only)
+    elif args.versions or args.all_versions:
+        odoo_versions = [version_key(v) for v in args.versions] if args.versions else None
+        db.analyse_versions(odoo_versions, args.include_authors, args.exclude_authors, args.format, args.output)
+    elif args.odoo_version:
+        db.analyse(args.odoo_version, args.include_authors, args.exclude_authors, args.format, args.output, args.addons_path)
+    else:
+        print("Please provide an Odoo version, --versions or --all-versions.")
+
+
+def run_chain(commands):
+    # Chained commands share a single load and a single save of each module
+    # database, later commands see the changes of earlier ones. Nothing is
+    # saved if a command fails.
+    for args in commands:
+        if args.command not in CHAIN_COMMANDS or getattr(args, 'watch', False) or getattr(args, 'all_tenants', False):
+            print(f"Error: Only {', '.join(CHAIN_COMMANDS)} can be chained, without --watch and --all-tenants.")
+            return
+    databases = {}
+    try:
+        for args in commands:
+            path = getattr(args, 'output_yaml_file', None) or args.yaml_file
+            key = database_key(path, getattr(args, 'tenant', None))
+            if key not in databases:
+                databases[key] = ModuleDB(path, key[1])
+            if getattr(args, 'against', None):
+                args.against = databases.get(database_key(args.against), args.against)
+            run_database_command(databases[key], args)
+
+        for db in databases.values():
+            if db.changed:
+                db.save()
+                print(f"Saved the changes to {db}.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+def import_csv_arguments(parser):
+    parser.add_argument('input_csv_file', help='Input CSV file, or - to read from stdin')
+    parser.add_argument('output_yaml_file', help='Output YAML file')
+    parser.add_argument('odoo_version', help='Odoo version')
+    parser.add_argument('--tenant', help='Import into this tenant of a fleet directory')
+
+
+def import_batch_arguments(parser):
+    parser.add_argument('output_yaml_file', help='Output YAML file')
+    parser.add_argument('imports', nargs='*', type=parse_import_pair, metavar='CSV:VERSION', help='Input CSV file and Odoo version pairs')
+    parser.add_argument('--manifest', help="File with one '<csv file> <odoo version>' pair per line")
+    parser.add_argument('--jobs', type=int, help='Number of CSV files parsed in parallel (default: number of CPUs)')
+
+
+def import_db_arguments(parser):
+    parser.add_argument('dsn', help="PostgreSQL connection string, e.g. 'dbname=odoo host=localhost user=odoo'")
+    parser.add_argument('output_yaml_file', help='Output YAML file')
+    parser.add_argument('odoo_version', help='Odoo version')
+    parser.add_argument('--batch-size', type=int, default=DB_BATCH_SIZE, help='Number of rows fetched per round trip')
+
+
+def scan_addons_arguments(parser):
+    parser.add_argument('output_yaml_file', help='Output YAML file')
+    parser.add_argument('odoo_version', help='Odoo version')
+    parser.add_argument('addons_paths', nargs='+', help='Addons directories with the module manifests')
+    parser.add_argument('--all', action='store_true', help='Also add modules which are not in the YAML file yet')
+    parser.add_argument('--jobs', type=int, help='Number of threads reading manifests (default: depends on the number of CPUs)')
+
+
+def compare_arguments(parser):
+    parser.add_argument('yaml_file', help='YAML file')
+    parser.add_argument('source_version', help='Source version')
+    parser.add_argument('target_version', help='Target version')
+    parser.add_argument('--no-cache', action='store_true', help='Parse the YAML file instead of using the snapshot cache')
+    parser.add_argument('--include-authors', nargs='+', help='Include only modules from these authors (space-separated list)')
+    parser.add_argument('--exclude-authors', nargs='+', help='Exclude modules from these authors (space-separated list)')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='text', help='Output format (default: text)')
+    parser.add_argument('--output', help='Write the output to this file instead of stdout')
+    parser.add_argument('--against', help='Compare the source version with the target version of this module database')
+    parser.add_argument('--fields', nargs='+', choices=DIFF_FIELDS, help='Compare only these fields (default: all)')
+    parser.add_argument('--only', nargs='+', choices=DIFF_CHANGES, help='Report only these kinds of changes (default: all)')
+    parser.add_argument('--tenant', help='Compare the versions of this tenant of a fleet directory')
+
+
+def add_version_arguments(parser):
+    parser.add_argument('yaml_file', help='YAML file')
+    parser.add_argument('odoo_version', help='Odoo version to add')
+    parser.add_argument('--tenant', help='Add the version to this tenant of a fleet directory')
+
+
+def remove_version_arguments(parser):
+    parser.add_argument('yaml_file', help='YAML file')
+    parser.add_argument('odoo_version', help='Odoo version to remove')
+    parser.add_argument('--tenant', help='Remove the version from this tenant of a fleet directory')
+
+
+def analyse_arguments(parser):
+    parser.add_argument('yaml_file', help='YAML file')
+    parser.add_argument('odoo_version', nargs='?', help='Odoo version to analyse')
+    parser.add_argument('--versions', nargs='+', help='Analyse these versions in one pass and print a module x version matrix')
+    parser.add_argument('--all-versions', action='store_true', help='Analyse all versions in one pass and print a module x version matrix')
+    parser.add_argument('--include-authors', nargs='+', help='Include only modules from these authors (space-separated list)')
+    parser.add_argument('--exclude-authors', nargs='+', help='Exclude modules from these authors (space-separated list)')
+    parser.add_argument('--no-cache', action='store_true', help='Parse the YAML file instead of using the snapshot cache')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='text', help='Output format (default: text)')
+    parser.add_argument('--output', help='Write the output to this file instead of stdout')
+    parser.add_argument('--watch', action='store_true', help='Analyse again whenever the file changes')
+    parser.add_argument('--tenant', help='Analyse this tenant of a fleet directory')
+    parser.add_argument('--all-tenants', action='store_true', help='Analyse all tenants of a fleet directory in one pass')
+    parser.add_argument('--addons-path', nargs='+', help='Addons directories with the module manifests, to report required modules blocked by their dependencies')
+
+
+def history_arguments(parser):
+    parser.add_argument('yaml_file', help='YAML file in a git repository')
+    parser.add_argument('--versions', nargs='+', help='Report only these versions (default: all)')
+    parser.add_argument('--jobs', type=int, help='Number of revisions parsed in parallel (default: number of CPUs)')
+    parser.add_argument('--no-cache', action='store_true', help='Parse all revisions instead of using the history cache')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='text', help='Output format (default: text)')
+    parser.add_argument('--output', help='Write the output to this file instead of stdout')
+
+
+def serve_arguments(parser):
+    parser.add_argument('yaml_file', help='YAML file')
+    parser.add_argument('--host', default=SERVE_HOST, help=f'Address to listen on (default: {SERVE_HOST})')
+    parser.add_argument('--port', type=int, default=SERVE_PORT, help=f'Port to listen on (default: {SERVE_PORT})')
+    parser.add_argument('--tenant', help='Serve this tenant of a fleet directory')
+
+
+def convert_arguments(parser):
+    parser.add_argument('source', help='Source YAML file or sharded directory')
+    parser.add_argument('target', help='Target YAML file or sharded directory (ending with /)')
+    parser.add_argument('--prefix-length', type=int, help='Group modules by this many leading characters of their name per shard (default: one shard per module)')
+
+
+def cache_arguments(parser):
+    cache_subparsers = parser.add_subparsers(dest='cache_command')
+    cache_clear_parser = cache_subparsers.add_parser('clear')
+    cache_clear_parser.add_argument('yaml_file', help='YAML file')
+
+
+# Arguments of each command, only the parsers of invoked commands are built
+COMMAND_ARGUMENTS = {
+    'import-csv': import_csv_arguments,
+    'import-batch': import_batch_arguments,
+    'import-db': import_db_arguments,
+    'scan-addons': scan_addons_arguments,
+    'compare': compare_arguments,
+    'add-version': add_version_arguments,
+    'remove-version': remove_version_arguments,
+    'analyse': analyse_arguments,
+    'history': history_arguments,
+    'serve': serve_arguments,
+    'convert': convert_arguments,
+    'cache': cache_arguments,
+}
+
+
+def build_parser(commands=None):
+    # Parser with the given commands, all commands by default
+    import argparse
+    parser = argparse.ArgumentParser(description='Process CSV data and append to a YAML file.',
+                                     epilog=f"Commands can be chained with '{CHAIN_SEPARATOR}' to load and save the module database once.")
+    subparsers = parser.add_subparsers(dest='command')
+    for command, add_arguments in COMMAND_ARGUMENTS.items():
+        if commands is None or command in commands:
+            add_arguments(subparsers.add_parser(command))
+
+    parser.add_argument('--version', action='version', version='%(prog)s {}'.format(VERSION))
+    parser.add_argument('--timings', action='store_true', help='Report wall time and peak memory per phase on stderr, tracing memory slows omm down')
+    parser.add_argument('--profile', metavar='FILE', help='Write cProfile data of the command to this file')
+    return parser
+
+
+def command_name(argv):
+    # The command of argv, after the global options
+    arguments = iter(argv)
+    for arg in arguments:
+        if arg == '--profile':
+            next(arguments, None)
+        elif not arg.startswith('-'):
+            return arg
+    return None
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv == ['--version']:
+        # Answered without importing argparse, e.g. for shell loops
+        print(f"{os.path.basename(sys.argv[0])} {VERSION}")
+        return
+
+    chain = split_chain(argv)
+    names = {command_name(command_argv) for command_argv in chain}
+    # Unknown commands and --help need all commands
+    parser = build_parser(names if names <= set(COMMAND_ARGUMENTS) else None)
+    commands = [parser.parse_args(command_argv) for command_argv in chain]
+    args = commands[0]
+
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    if args.timings:
+        timings.start()
+    try:
+        if len(commands) > 1:
+            run_chain(commands)
+        else:
+            run_command(args)
+    finally:
+        if args.timings:
+            timings.stop()
+            timings.report(sys.stderr)
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+
+
+if __name__ == '__main__':
+    main()
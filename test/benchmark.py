@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Benchmark of the omm commands on synthetic module databases.
+
+Run all benchmarks with ``python3 test/benchmark.py``, with PyYAML 100000
+modules take minutes per command. Use ``--sizes`` to choose the module
+counts, ``--save results.json`` to keep the results and ``--baseline
+results.json`` to fail when a command got slower than in a previous run.
+``--generate DIR`` only writes the synthetic CSV exports and YAML files,
+e.g. to try commands manually.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import yaml
+
+# Add the parent directory to the path to import omm
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import omm
+
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+VERSIONS = ['10.0', '11.0', '12.0', '13.0', '14.0', '15.0', '16.0', '17.0']
+
+# Few authors own most modules, like in real installations
+AUTHORS = [
+    'Odoo S.A.',
+    'Odoo Community Association (OCA)',
+    'Nitrokey GmbH, Odoo Community Association (OCA)',
+    'Camptocamp, Odoo Community Association (OCA)',
+    'initOS GmbH',
+]
+NAME_PARTS = ['account', 'sale', 'stock', 'purchase', 'hr', 'mrp', 'project', 'website', 'mail', 'base', 'report', 'l10n']
+STATES = [('installed', 0.6), ('not installed', 0.4)]
+EVALUATIONS = [('', 0.5), ('required', 0.2), ('not required', 0.15), ('desired', 0.1), ('not desired', 0.05)]
+
+
+def weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def generate_authors(count, rng):
+    # Author names with a Zipf like distribution over count authors
+    authors = AUTHORS[:count] + [f'Partner {i}' for i in range(len(AUTHORS), count)]
+    return [(author, 1 / (i + 1)) for i, author in enumerate(authors)]
+
+
+def module_name(i, rng):
+    return f"{rng.choice(NAME_PARTS)}_{rng.choice(NAME_PARTS)}_{i:06d}"
+
+
+def generate_modules(module_count, version_count=3, author_count=20, duplicate_keys=0.05, seed=0):
+    # modules.yaml data, a share of the modules has a version under a float
+    # and a string key, like files edited with older omm versions
+    rng = random.Random(seed)
+    authors = generate_authors(author_count, rng)
+    versions = VERSIONS[-version_count:]
+    data = []
+    for i in range(module_count):
+        entry = {'name': module_name(i, rng), 'author': weighted(rng, authors)}
+        for version in versions:
+            version_data = {
+                'state': weighted(rng, STATES),
+                'auto_install': rng.choice('ft'),
+                'evaluation': weighted(rng, EVALUATIONS),
+                'comment': rng.choice(['', '', '', 'Migrated by OCA', 'Replaced by a core module']),
+            }
+            if rng.random() < duplicate_keys:
+                entry[float(version)] = dict(version_data, evaluation='', comment='')
+            entry[version] = version_data
+        data.append(entry)
+    data.sort(key=lambda entry: entry['name'])
+    return data
+
+
+def generate_csv_rows(data, new_modules=0.05, missing_modules=0.1, seed=1):
+    # Rows of a psql export of an installation with most modules of data and
+    # some new ones
+    rng = random.Random(seed)
+    authors = sorted({entry['author'] for entry in data})
+    rows = [
+        (entry['name'], entry['author'], 'installed', rng.choice('ft'))
+        for entry in data if rng.random() >= missing_modules
+    ]
+    rows += [
+        (f"new_{module_name(i, rng)}", rng.choice(authors), 'installed', 'f')
+        for i in range(int(len(data) * new_modules))
+    ]
+    rows.sort()
+    return rows
+
+
+def write_csv(rows, csv_file):
+    with open(csv_file, 'w') as f:
+        f.write('name;author;state;auto_install\n')
+        for row in rows:
+            f.write(';'.join(row) + '\n')
+        f.write(f'({len(rows)} rows)\n')
+
+
+def write_yaml(data, yaml_file):
+    # The plain dumper keeps float keys as floats
+    with open(yaml_file, 'w') as f:
+        yaml.dump(data, f, Dumper=omm.yaml_dumper(), **omm.YAML_DUMP_OPTIONS)
+
+
+def generate_files(directory, module_count, version_count=3, author_count=20, duplicate_keys=0.05):
+    data = generate_modules(module_count, version_count, author_count, duplicate_keys)
+    yaml_file = os.path.join(directory, f'modules-{module_count}.yaml')
+    csv_file = os.path.join(directory, f'installed-modules-{module_count}.csv')
+    write_yaml(data, yaml_file)
+    write_csv(generate_csv_rows(data), csv_file)
+    return yaml_file, csv_file
+
+
+def benchmarks(yaml_file, csv_file, versions):
+    # (name, setup, function) of all benchmarked commands, setup copies the
+    # input for commands changing the file and is not measured
+    source_version, target_version = versions[0], versions[-1]
+    work_file = os.path.join(os.path.dirname(yaml_file), 'work.yaml')
+
+    def copy():
+        shutil.copyfile(yaml_file, work_file)
+
+    def clear():
+        omm.clear_cache(yaml_file)
+
+    return [
+        ('import-csv', copy, lambda: omm.process_csv(csv_file, work_file, target_version)),
+        ('add-version', copy, lambda: omm.add_version(work_file, '18.0')),
+        ('remove-version', copy, lambda: omm.remove_version(work_file, source_version)),
+        ('compare', None, lambda: omm.compare_versions(yaml_file, source_version, target_version, use_cache=False)),
+        ('analyse', None, lambda: omm.analyse(yaml_file, target_version, use_cache=False)),
+        ('analyse (cold cache)', clear, lambda: omm.analyse(yaml_file, target_version)),
+        ('analyse (warm cache)', None, lambda: omm.analyse(yaml_file, target_version)),
+    ]
+
+
+def measure(setup, function, repeat=1, memory=True):
+    # Best wall time of repeat runs and peak traced memory of a separate run,
+    # tracing allocations slows the code down too much to time it as well
+    times = []
+    peak = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(repeat):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+
+        if memory:
+            if setup:
+                setup()
+            tracemalloc.start()
+            try:
+                function()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    return min(times), peak
+
+
+def run(sizes=DEFAULT_SIZES, version_count=3, author_count=20, duplicate_keys=0.05, repeat=1, memory=True, commands=None):
+    results = []
+    versions = VERSIONS[-version_count:]
+    for size in sizes:
+        directory = tempfile.mkdtemp()
+        try:
+            yaml_file, csv_file = generate_files(directory, size, version_count, author_count, duplicate_keys)
+            for name, setup, function in benchmarks(yaml_file, csv_file, versions):
+                if commands and name.split()[0] not in commands:
+                    continue
+                seconds, peak = measure(setup, function, repeat, memory)
+                result = {'command': name, 'modules': size, 'seconds': seconds, 'peak_bytes': peak}
+                print_result(result)
+                results.append(result)
+        finally:
+            shutil.rmtree(directory)
+    return results
+
+
+def print_result(result):
+    peak = f"{result['peak_bytes'] / 2 ** 20:10.1f} MiB" if result['peak_bytes'] is not None else ' ' * 14
+    print(f"{result['command']:<22}{result['modules']:>8} modules{result['seconds']:10.3f} s{peak}", flush=True)
+
+
+def regressions(results, baseline, tolerance):
+    # Results slower than the baseline by more than the tolerance factor
+    previous = {(result['command'], result['modules']): result['seconds'] for result in baseline}
+    return [
+        (result, previous[result['command'], result['modules']]) for result in results
+        if (result['command'], result['modules']) in previous
+        and result['seconds'] > previous[result['command'], result['modules']] * tolerance
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark omm commands on synthetic module databases.')
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES, help='Module counts (default: 1000 10000 100000)')
+    parser.add_argument('--version-count', type=int, default=3, choices=range(2, len(VERSIONS) + 1), help='Versions per module (default: 3)')
+    parser.add_argument('--author-count', type=int, default=20, help='Number of distinct authors (default: 20)')
+    parser.add_argument('--duplicate-keys', type=float, default=0.05, help='Share of versions with an additional float key (default: 0.05)')
+    parser.add_argument('--commands', nargs='+', help='Benchmark only these commands, e.g. import-csv analyse')
+    parser.add_argument('--repeat', type=int, default=1, help='Report the best time of this many runs (default: 1)')
+    parser.add_argument('--no-memory', action='store_true', help="Don't measure the peak memory, which needs another run")
+    parser.add_argument('--save', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Fail if a command is slower than in this JSON file of a previous run')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='Allowed slowdown factor against the baseline (default: 1.5)')
+    parser.add_argument('--generate', metavar='DIR', help='Only write the synthetic CSV and YAML files to this directory')
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        os.makedirs(args.generate, exist_ok=True)
+        for size in args.sizes:
+            for path in generate_files(args.generate, size, args.version_count, args.author_count, args.duplicate_keys):
+                print(path)
+        return 0
+
+    print(f"{'Command':<22}{'Modules':>16}{'Time':>12}{'Peak memory':>14}")
+    results = run(args.sizes, args.version_count, args.author_count, args.duplicate_keys, args.repeat, not args.no_memory, args.commands)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f), args.tolerance)
+        for result, seconds in slower:
+            print(f"Regression: {result['command']} with {result['modules']} modules took {result['seconds']:.3f} s instead of {seconds:.3f} s")
+        if slower:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,6 +12,24 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import omm
 
 
+def setUpModule():
+    """Keep the snapshot caches of all tests out of the user's cache directory."""
+    from unittest import mock
+    global cache_home, cache_patcher
+
+    cache_home = tempfile.mkdtemp()
+    cache_patcher = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': cache_home})
+    cache_patcher.start()
+
+
+def tearDownModule():
+    """Remove the snapshot caches of the tests."""
+    import shutil
+
+    cache_patcher.stop()
+    shutil.rmtree(cache_home)
+
+
 class TestOMMImportCSV(unittest.TestCase):
     """Test cases for the CSV import functionality with focus on state management."""
 
@@ -331,6 +349,194 @@ class TestOMMImportCSV(unittest.TestCase):
         self.assertEqual(version_data['comment'], 'Test comment')
 
 
+    def test_concatenated_export(self):
+        """Test importing several psql exports concatenated into one CSV."""
+        with open(self.csv_file, 'w', newline='') as f:
+            f.write('name;author;state;auto_install\n')
+            f.write('module_a;Author A;installed;f\n')
+            f.write('(1 row)\n')
+            f.write('\n')
+            f.write('name;author;state;auto_install\n')
+            f.write('module_b;Author B;installed;t\n')
+            f.write('module_a;Author A;installed;f\n')
+            f.write('(2 rows)\n')
+
+        import io
+        from contextlib import redirect_stdout
+
+        with redirect_stdout(io.StringIO()):
+            omm.process_csv(self.csv_file, self.yaml_file, self.odoo_version)
+
+        result = self.read_yaml_file()
+        self.assertEqual([module['name'] for module in result], ['module_a', 'module_b'])
+        self.assertEqual(result[1][self.odoo_version]['auto_install'], 't')
+
+    def test_import_from_stdin(self):
+        """Test that '-' reads the CSV from stdin."""
+        import io
+        from unittest import mock
+        from contextlib import redirect_stdout
+
+        stdin = io.StringIO('name;author;state;auto_install\nstdin_module;Test Author;installed;f\n(1 row)\n')
+        with mock.patch.object(sys, 'stdin', stdin), redirect_stdout(io.StringIO()):
+            omm.process_csv('-', self.yaml_file, self.odoo_version)
+
+        result = self.read_yaml_file()
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]['name'], 'stdin_module')
+        self.assertEqual(result[0][self.odoo_version]['state'], 'installed')
+
+
+class TestOMMImportBatch(unittest.TestCase):
+    """Test cases for importing several CSV files in one pass."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'batch.yaml')
+        self.initial_yaml = [
+            {
+                'name': 'evaluated_module',
+                'author': 'Test Author',
+                '15.0': {
+                    'state': 'installed',
+                    'auto_install': 'f',
+                    'evaluation': 'required',
+                    'comment': 'Keep me'
+                }
+            }
+        ]
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def create_csv_file(self, filename, names):
+        """Helper method to create a CSV file with installed modules."""
+        path = os.path.join(self.temp_dir, filename)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(['name', 'author', 'state', 'auto_install'])
+            for name in names:
+                writer.writerow([name, 'Test Author', 'installed', 'f'])
+        return path
+
+    def create_yaml_file(self, path):
+        """Helper method to create a YAML file with the initial modules."""
+        with open(path, 'w') as f:
+            yaml.dump(self.initial_yaml, f, default_flow_style=False, sort_keys=False)
+
+    def test_batch_matches_sequential_imports(self):
+        """Test that a batch import writes the same file as one import per version."""
+        import io
+        from contextlib import redirect_stdout
+
+        csv_12 = self.create_csv_file('12.csv', ['module_a', 'evaluated_module'])
+        csv_15 = self.create_csv_file('15.csv', ['module_b'])
+        sequential_file = os.path.join(self.temp_dir, 'sequential.yaml')
+        self.create_yaml_file(sequential_file)
+        self.create_yaml_file(self.yaml_file)
+
+        with redirect_stdout(io.StringIO()):
+            omm.process_csv(csv_12, sequential_file, '12.0')
+            omm.process_csv(csv_15, sequential_file, '15.0')
+            omm.import_batch(self.yaml_file, [(csv_12, '12.0'), (csv_15, '15.0')], jobs=2)
+
+        with open(sequential_file) as f:
+            expected = f.read()
+        with open(self.yaml_file) as f:
+            self.assertEqual(f.read(), expected)
+
+        result = omm.load_yaml(self.yaml_file)
+        evaluated_module = next(m for m in result if m['name'] == 'evaluated_module')
+        self.assertEqual(evaluated_module['15.0']['state'], 'not installed')
+        self.assertEqual(evaluated_module['15.0']['comment'], 'Keep me')
+
+    def test_same_version_csv_files_combined(self):
+        """Test that CSV files of the same version are merged as one export."""
+        import io
+        from contextlib import redirect_stdout
+
+        manifest = os.path.join(self.temp_dir, 'manifest.txt')
+        with open(manifest, 'w') as f:
+            f.write('# database exports\n')
+            f.write(f"{self.create_csv_file('db1.csv', ['module_a'])} 15.0\n")
+            f.write(f"{self.create_csv_file('db2.csv', ['module_b'])} 15.0\n")
+
+        imports = omm.read_import_manifest(manifest)
+        self.assertEqual([odoo_version for input_file, odoo_version in imports], ['15.0', '15.0'])
+
+        with redirect_stdout(io.StringIO()):
+            omm.import_batch(self.yaml_file, imports, jobs=1)
+
+        result = omm.load_yaml(self.yaml_file)
+        self.assertEqual([m['name'] for m in result], ['module_a', 'module_b'])
+        self.assertTrue(all(m['15.0']['state'] == 'installed' for m in result))
+
+    def test_parse_import_pair(self):
+        """Test parsing of CSV:VERSION command line arguments."""
+        import argparse
+
+        self.assertEqual(omm.parse_import_pair('exports/db.csv:15.0'), ('exports/db.csv', '15.0'))
+        with self.assertRaises(argparse.ArgumentTypeError):
+            omm.parse_import_pair('db.csv')
+
+
+class TestOMMImportDB(unittest.TestCase):
+    """Test cases for importing modules directly from a database."""
+
+    def setUp(self):
+        """Set up test fixtures with an in-memory ir_module_module table."""
+        import sqlite3
+
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'test.yaml')
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.execute('CREATE TABLE ir_module_module (name TEXT, author TEXT, state TEXT, auto_install BOOLEAN)')
+        self.connection.executemany('INSERT INTO ir_module_module VALUES (?, ?, ?, ?)', [
+            ('account', 'Odoo S.A.', 'installed', False),
+            ('semicolon_author', 'Foo; Bar', 'installed', True),
+            ('uninstalled_module', 'Odoo S.A.', 'uninstalled', False),
+            ('no_author', None, 'installed', False),
+        ])
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        self.connection.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_import_db(self):
+        """Test that installed modules are merged like a CSV import."""
+        import io
+        from contextlib import redirect_stdout
+
+        with open(self.yaml_file, 'w') as f:
+            yaml.dump([{
+                'name': 'account',
+                'author': 'Odoo S.A.',
+                '15.0': {'state': 'not installed', 'auto_install': 'f', 'evaluation': 'required', 'comment': 'Core'}
+            }, {
+                'name': 'removed_module',
+                'author': 'Test Author',
+                '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': '', 'comment': ''}
+            }], f, default_flow_style=False, sort_keys=False)
+
+        with redirect_stdout(io.StringIO()):
+            omm.import_db(None, self.yaml_file, '15.0', cursor=self.connection.cursor(), batch_size=1)
+
+        result = {m['name']: m for m in omm.load_yaml(self.yaml_file)}
+        self.assertEqual(sorted(result), ['account', 'no_author', 'removed_module', 'semicolon_author'])
+        self.assertEqual(result['account']['15.0'], {
+            'state': 'installed', 'auto_install': 'f', 'evaluation': 'required', 'comment': 'Core'
+        })
+        self.assertEqual(result['semicolon_author']['author'], 'Foo; Bar')
+        self.assertEqual(result['semicolon_author']['15.0']['auto_install'], 't')
+        self.assertEqual(result['no_author']['author'], '')
+        self.assertEqual(result['removed_module']['15.0']['state'], 'not installed')
+
+
 class TestOMMAnalyse(unittest.TestCase):
     """Test cases for the analyse functionality."""
 
@@ -406,6 +612,1910 @@ class TestOMMAnalyse(unittest.TestCase):
         self.assertIn('1 modules', output)
 
 
+class TestOMMAnalyseVersions(unittest.TestCase):
+    """Test cases for analysing several versions in one pass."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'test.yaml')
+        self.modules = [
+            {
+                'name': 'migrated_module',
+                'author': 'Test Author',
+                '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': 'required', 'comment': ''},
+                '9.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': '', 'comment': ''}
+            },
+            {
+                'name': 'missing_module',
+                'author': 'OCA',
+                '15.0': {'state': 'not installed', 'auto_install': 'f', 'evaluation': 'required', 'comment': ''},
+                '12.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': 'not required', 'comment': ''}
+            },
+            {
+                'name': 'irrelevant_module',
+                'author': 'OCA',
+                '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': 'DM', 'comment': ''}
+            }
+        ]
+        omm.dump_yaml(self.modules, self.yaml_file)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_groups_match_single_version_analysis(self):
+        """Test that the single pass groups equal one analysis per version."""
+        data = omm.modules_from_data(omm.load_modules(self.yaml_file))
+        versions = omm.collect_versions(data)
+        self.assertEqual(versions, ['9.0', '12.0', '15.0'])
+
+        results = omm.group_modules_by_version(data, versions)
+        for odoo_version in versions:
+            self.assertEqual(results[odoo_version], omm.group_modules(data, odoo_version))
+
+        state_groups, required_and_migrated_count = results['15.0']
+        self.assertEqual(state_groups['Required but not installed'], ['missing_module'])
+        self.assertEqual(required_and_migrated_count, 1)
+        self.assertEqual(sorted(results['12.0'][0]['Not evaluated']), ['irrelevant_module', 'migrated_module'])
+
+    def test_matrix_output_loads_once(self):
+        """Test that the matrix is printed from a single load."""
+        import io
+        from unittest import mock
+        from contextlib import redirect_stdout
+
+        output = io.StringIO()
+        with mock.patch.object(omm, 'load_modules', wraps=omm.load_modules) as load_modules, redirect_stdout(output):
+            omm.analyse_versions(self.yaml_file, None, None, ['test author'], False)
+
+        self.assertEqual(load_modules.call_count, 1)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0].split(), ['State', '9.0', '12.0', '15.0'])
+        matrix = {line.split()[0]: line for line in lines if line.startswith(('missing', 'irrelevant', 'migrated'))}
+        self.assertEqual(sorted(matrix), ['irrelevant_module', 'missing_module'])
+        self.assertIn('NE', matrix['missing_module'])
+        self.assertIn('NRI', matrix['missing_module'])
+        self.assertIn('RN', matrix['missing_module'])
+
+
+class TestOMMOutputFormats(unittest.TestCase):
+    """Test cases for machine-readable analyse and compare output."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'test.yaml')
+        omm.dump_yaml([
+            {
+                'name': 'module_a',
+                'author': 'Author, with comma',
+                '12.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': '', 'comment': ''},
+                '15.0': {'state': 'not installed', 'auto_install': 'f', 'evaluation': 'required', 'comment': ''}
+            },
+            {
+                'name': 'module_b',
+                'author': 'OCA',
+                '12.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': '', 'comment': ''},
+                '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': 'required', 'comment': ''}
+            }
+        ], self.yaml_file)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def capture(self, function, *args, **kwargs):
+        """Helper method returning the stdout of a function."""
+        import io
+        from contextlib import redirect_stdout
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            function(*args, **kwargs)
+        return output.getvalue()
+
+    def test_analyse_json(self):
+        """Test JSON output of analyse."""
+        import json
+
+        output = self.capture(omm.analyse, self.yaml_file, '15.0', use_cache=False, output_format='json')
+
+        self.assertEqual(json.loads(output), [
+            {'name': 'module_a', 'author': 'Author, with comma', '15.0': 'Required but not installed'},
+            {'name': 'module_b', 'author': 'OCA', '15.0': 'Required and migrated'}
+        ])
+        self.assertNotIn('\033[', output)
+
+    def test_analyse_versions_csv_file(self):
+        """Test CSV output of a multi-version analysis written to a file."""
+        output_file = os.path.join(self.temp_dir, 'report.csv')
+        self.capture(omm.analyse_versions, self.yaml_file, None, use_cache=False, output_format='csv', output=output_file)
+
+        with open(output_file, newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows, [
+            ['name', 'author', '12.0', '15.0'],
+            ['module_a', 'Author, with comma', 'Not evaluated', 'Required but not installed'],
+            ['module_b', 'OCA', 'Not evaluated', 'Required and migrated']
+        ])
+
+    def test_compare_ndjson(self):
+        """Test NDJSON output of compare."""
+        import json
+
+        output = self.capture(omm.compare_versions, self.yaml_file, '12.0', '15.0', False, output_format='ndjson')
+
+        self.assertEqual([json.loads(line) for line in output.splitlines()], [
+            {'name': 'module_a', 'change': 'changed', 'changed_fields': 'state evaluation',
+             'source_state': 'installed', 'target_state': 'not installed',
+             'source_auto_install': 'f', 'target_auto_install': 'f',
+             'source_evaluation': '', 'target_evaluation': 'required',
+             'source_author': 'Author, with comma', 'target_author': 'Author, with comma'},
+            {'name': 'module_b', 'change': 'changed', 'changed_fields': 'evaluation',
+             'source_state': 'installed', 'target_state': 'installed',
+             'source_auto_install': 'f', 'target_auto_install': 'f',
+             'source_evaluation': '', 'target_evaluation': 'required',
+             'source_author': 'OCA', 'target_author': 'OCA'}
+        ])
+
+    def test_records_streamed(self):
+        """Test that records are written before all of them are computed."""
+        import io
+
+        stream = io.StringIO()
+        written = []
+
+        def records():
+            yield {'name': 'first'}
+            written.append(stream.getvalue())
+            yield {'name': 'second'}
+
+        from unittest import mock
+        with mock.patch.object(sys, 'stdout', stream):
+            omm.write_records(records(), ['name'], 'ndjson')
+
+        self.assertEqual(written, ['{"name": "first"}\n'])
+        self.assertEqual(stream.getvalue(), '{"name": "first"}\n{"name": "second"}\n')
+
+
+class TestOMMCompare(unittest.TestCase):
+    """Test cases for the compare diff engine."""
+
+    def setUp(self):
+        """Set up test fixtures with two customer module databases."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.source_file = os.path.join(self.temp_dir, 'source.yaml')
+        self.target_file = os.path.join(self.temp_dir, 'target.yaml')
+        omm.dump_yaml([
+            {'name': 'both_same', 'author': 'OCA', '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': 'required'}},
+            {'name': 'both_changed', 'author': 'OCA', '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': ''}},
+            {'name': 'only_source', 'author': 'OCA', '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': ''}},
+            {'name': 'new_author', 'author': 'Old Author', '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': ''}},
+        ], self.source_file)
+        # Hand edited file that is not sorted by name
+        omm.dump_yaml([
+            {'name': 'only_target', 'author': 'OCA', '15.0': {'state': 'installed', 'auto_install': 't', 'evaluation': ''}},
+            {'name': 'new_author', 'author': 'New Author', '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': ''}},
+            {'name': 'both_same', 'author': 'OCA', '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': 'required'}},
+            {'name': 'both_changed', 'author': 'OCA', '15.0': {'state': 'not installed', 'auto_install': 't', 'evaluation': ''}},
+        ], self.target_file)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def compare(self, *args, **kwargs):
+        """Helper method returning the stdout of compare between both files."""
+        import io
+        from contextlib import redirect_stdout
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            omm.compare_versions(self.source_file, '15.0', '15.0', False, against=self.target_file, *args, **kwargs)
+        return output.getvalue()
+
+    def test_diff_modules(self):
+        """Test added, removed and changed modules from a sorted merge."""
+        source = [('a', 'OCA', {'state': 'installed'}), ('b', 'OCA', {'state': 'installed'}), ('d', 'OCA', {'state': 'installed'})]
+        target = [('b', 'Odoo', {'state': 'installed'}), ('c', 'OCA', {'state': 'installed'}), ('d', 'OCA', {'state': 'installed'})]
+
+        self.assertEqual([(change, name, fields) for change, name, _, _, fields in omm.diff_modules(source, target)], [
+            ('removed', 'a', []),
+            ('changed', 'b', ['author']),
+            ('added', 'c', []),
+        ])
+        self.assertEqual(list(omm.diff_modules(source, target, ['state'])), [
+            ('removed', 'a', source[0], None, []),
+            ('added', 'c', None, target[1], []),
+        ])
+
+    def test_compare_files(self):
+        """Test comparing one version of two module databases."""
+        output = self.compare()
+
+        self.assertIn('Added: only_target', output)
+        self.assertIn('Removed: only_source', output)
+        self.assertIn("Changed: both_changed: state 'installed' -> 'not installed', auto_install 'f' -> 't'", output)
+        self.assertIn("Changed: new_author: author 'Old Author' -> 'New Author'", output)
+        self.assertNotIn('both_same', output)
+        self.assertIn('1 added, 1 removed, 2 changed (state: 1, auto_install: 1, evaluation: 0, author: 1)', output)
+
+    def test_field_and_change_filters(self):
+        """Test that only the selected fields and kinds of changes are reported."""
+        output = self.compare(fields=['author'], changes=['changed'])
+
+        self.assertEqual(output.splitlines(), [
+            "Changed: new_author: author 'Old Author' -> 'New Author'",
+            f"Summary {self.source_file} 15.0 -> {self.target_file} 15.0: 1 changed (author: 1)"
+        ])
+
+
+class TestOMMDependencies(unittest.TestCase):
+    """Test cases for the dependency-aware analysis based on module manifests."""
+
+    def setUp(self):
+        """Set up an addons directory and a module database."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.addons_path = os.path.join(self.temp_dir, 'addons')
+        self.yaml_file = os.path.join(self.temp_dir, 'modules.yaml')
+        self.write_manifest('base', {'name': 'Base', 'depends': []})
+        self.write_manifest('sale', {'name': 'Sales', 'depends': ['base', 'product']})
+        self.write_manifest('product', {'name': 'Products', 'depends': ['uom']})
+        self.write_manifest('uom', {'name': 'Units', 'depends': ['base']})
+        self.write_manifest('sale_stock', {'name': 'Sale Stock', 'depends': ['sale'], 'auto_install': True})
+        self.write_manifest('broken', "{'name': 'Broken', 'depends': [__import__('os')]}")
+        omm.dump_yaml([
+            {'name': name, 'author': 'Odoo S.A.', '15.0': {'state': state, 'auto_install': 'f', 'evaluation': evaluation, 'comment': ''}}
+            for name, state, evaluation in [
+                ('base', 'installed', 'required'),
+                ('product', 'not installed', 'not required'),
+                ('sale', 'not installed', 'required'),
+                ('sale_stock', 'not installed', ''),
+                ('uom', 'not installed', ''),
+            ]
+        ], self.yaml_file)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def write_manifest(self, name, manifest):
+        """Helper method writing the manifest of a module."""
+        os.makedirs(os.path.join(self.addons_path, name))
+        with open(os.path.join(self.addons_path, name, '__manifest__.py'), 'w') as f:
+            f.write(manifest if isinstance(manifest, str) else f"# Comment\n{manifest!r}\n")
+
+    def test_scan_manifests(self):
+        """Test that manifests are parsed without executing them and cached by mtime."""
+        from unittest import mock
+
+        manifests = omm.scan_manifests([self.addons_path])
+        self.assertEqual(sorted(manifests), ['base', 'product', 'sale', 'sale_stock', 'uom'])
+        self.assertEqual(manifests['sale']['depends'], ['base', 'product'])
+
+        with mock.patch('builtins.open', side_effect=AssertionError):
+            self.assertEqual(omm.scan_manifests([self.addons_path]), manifests)
+
+    def test_dependency_order(self):
+        """Test that dependencies come first and cycles don't get lost."""
+        order = omm.dependency_order({'a': ['b'], 'b': ['c'], 'c': [], 'x': ['y'], 'y': ['x']})
+
+        self.assertEqual(order[:3], ['c', 'b', 'a'])
+        self.assertEqual(sorted(order[3:]), ['x', 'y'])
+
+    def test_transitive_blockers(self):
+        """Test that indirect not installed dependencies block required modules."""
+        side, = omm.open_storage(self.yaml_file).version_sides(['15.0'])
+        blocked, auto_installed = omm.dependency_report(side, omm.scan_manifests([self.addons_path]))
+
+        self.assertEqual(blocked, [('sale', ['product', 'uom'])])
+        self.assertEqual(auto_installed, ['sale_stock'])
+
+    def test_analyse_output(self):
+        """Test the dependency report of analyse."""
+        import io
+        from contextlib import redirect_stdout
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            omm.analyse(self.yaml_file, '15.0', use_cache=False, addons_paths=[self.addons_path])
+
+        self.assertIn('sale blocked by product uom', output.getvalue())
+        self.assertIn('auto installed with required modules: 1 modules', output.getvalue())
+
+    def test_missing_addons_path(self):
+        """Test that a wrong addons path is reported instead of the YAML file."""
+        import io
+        from contextlib import redirect_stdout
+
+        missing = os.path.join(self.temp_dir, 'missing')
+        output = io.StringIO()
+        with redirect_stdout(output):
+            omm.analyse(self.yaml_file, '15.0', use_cache=False, addons_paths=[f'{self.addons_path},{missing}'])
+
+        self.assertEqual(output.getvalue(), f"Error: Addons path {missing} not found.\n")
+
+    def test_addons_path_requires_text_format(self):
+        """Test that the dependency report isn't silently dropped from other formats."""
+        import io
+        from contextlib import redirect_stdout
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            omm.analyse(self.yaml_file, '15.0', use_cache=False, output_format='json', addons_paths=[self.addons_path])
+
+        self.assertEqual(output.getvalue(), "Error: --addons-path is only supported with the text format.\n")
+
+
+class TestOMMScanAddons(unittest.TestCase):
+    """Test cases for populating a version from addons directories."""
+
+    def setUp(self):
+        """Set up two addons directories and a module database."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'modules.yaml')
+        self.odoo_addons = os.path.join(self.temp_dir, 'odoo')
+        self.oca_addons = os.path.join(self.temp_dir, 'oca')
+        self.write_manifest(self.odoo_addons, 'account', {'name': 'Invoicing', 'author': 'Odoo S.A.', 'version': '1.2'})
+        self.write_manifest(self.odoo_addons, 'sale', {'name': 'Sales', 'author': 'Odoo S.A.', 'auto_install': ['account']})
+        self.write_manifest(self.oca_addons, 'account', {'name': 'Shadowed', 'author': 'OCA'})
+        self.write_manifest(self.oca_addons, 'not_migrated', {'name': 'Old', 'author': 'OCA', 'installable': False})
+        self.write_manifest(self.oca_addons, 'other_series', {'name': 'Other', 'author': 'OCA', 'version': '14.0.1.0.0'})
+        self.write_manifest(self.oca_addons, 'migrated', {'name': 'New', 'author': 'OCA', 'version': '15.0.1.0.0'})
+        omm.dump_yaml([
+            {'name': name, 'author': author, '12.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': '', 'comment': ''}}
+            for name, author in [('account', 'Odoo S.A.'), ('migrated', 'OCA'), ('not_migrated', 'OCA'), ('other_series', 'OCA')]
+        ], self.yaml_file)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def write_manifest(self, addons_path, name, manifest):
+        """Helper method writing the manifest of a module."""
+        os.makedirs(os.path.join(addons_path, name))
+        with open(os.path.join(addons_path, name, '__manifest__.py'), 'w') as f:
+            f.write(repr(manifest))
+
+    def scan(self, *args):
+        """Helper method scanning the addons directories into version 15.0."""
+        import io
+        from contextlib import redirect_stdout
+
+        with redirect_stdout(io.StringIO()):
+            omm.scan_addons(self.yaml_file, '15.0', [f'{self.odoo_addons},{self.oca_addons}'], *args)
+        return {entry['name']: entry for entry in omm.load_yaml(self.yaml_file)}
+
+    def test_known_modules_merged(self):
+        """Test that installable modules of the version are merged like installed modules."""
+        result = self.scan()
+
+        self.assertEqual(sorted(result), ['account', 'migrated', 'not_migrated', 'other_series'])
+        self.assertEqual(result['account']['15.0'], {'state': 'installed', 'auto_install': 'f', 'evaluation': '', 'comment': ''})
+        self.assertEqual(result['account']['author'], 'Odoo S.A.')
+        self.assertEqual(result['migrated']['15.0']['state'], 'installed')
+        self.assertEqual(result['not_migrated']['15.0']['state'], 'not installed')
+        self.assertEqual(result['other_series']['15.0']['state'], 'not installed')
+
+    def test_all_modules(self):
+        """Test that --all adds modules which are not in the database yet."""
+        result = self.scan(True)
+
+        self.assertEqual(result['sale']['15.0']['auto_install'], 't')
+        self.assertNotIn('12.0', result['sale'])
+
+
+class TestOMMWatch(unittest.TestCase):
+    """Test cases for the change detection of analyse --watch."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'modules.yaml')
+        self.write('installed')
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, state):
+        """Helper method writing a module database with the given state."""
+        omm.dump_yaml([{'name': 'module_a', 'author': 'OCA', '15.0': {'state': state, 'evaluation': 'required'}}], self.yaml_file)
+
+    def later(self, delay, function, *args):
+        """Helper method calling a function in the background after a delay."""
+        import threading
+
+        timer = threading.Timer(delay, function, args)
+        timer.start()
+        self.addCleanup(timer.join)
+
+    def test_change_detected(self):
+        """Test that a content change is reported once after a save burst."""
+        changes = omm.watch_changes(self.yaml_file, interval=0.01, debounce=0.1)
+        first = next(changes)
+
+        self.later(0.05, self.write, 'not installed')
+        self.later(0.08, self.write, 'uninstalled')
+        second = next(changes)
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(second, omm.content_digest(self.yaml_file))
+        self.assertEqual(omm.load_yaml(self.yaml_file)[0]['15.0']['state'], 'uninstalled')
+
+    def test_unchanged_content_skipped(self):
+        """Test that saving the same content does not trigger a reload."""
+        changes = omm.watch_changes(self.yaml_file, interval=0.01, debounce=0.05)
+        next(changes)
+
+        stat = os.stat(self.yaml_file)
+        os.utime(self.yaml_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.later(0.3, self.write, 'not installed')
+        next(changes)
+
+        self.assertEqual(omm.load_yaml(self.yaml_file)[0]['15.0']['state'], 'not installed')
+
+
+class TestOMMHistory(unittest.TestCase):
+    """Test cases for the history command over git revisions."""
+
+    def setUp(self):
+        """Set up a git repository with several revisions of modules.yaml."""
+        import subprocess
+
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'modules.yaml')
+        self.git = lambda *args: subprocess.run(['git', '-C', self.temp_dir, '-c', 'user.name=Test', '-c', 'user.email=test@example.com', *args], check=True, capture_output=True)
+        self.git('init', '-q')
+        for evaluation, state in [('', 'not installed'), ('required', 'not installed'), ('required', 'installed'), ('', 'not installed')]:
+            omm.dump_yaml([{
+                'name': 'module_a',
+                'author': 'OCA',
+                '15.0': {'state': state, 'auto_install': 'f', 'evaluation': evaluation, 'comment': ''}
+            }], self.yaml_file)
+            self.git('add', 'modules.yaml')
+            self.git('commit', '-q', '-m', f'{evaluation} {state}')
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_history_records(self):
+        """Test the group counts of every revision, oldest first."""
+        records = omm.history_records(self.yaml_file, use_cache=False, jobs=1)
+
+        self.assertEqual([(r['version'], r['Not evaluated'], r['Required but not installed'], r[omm.REQUIRED_AND_MIGRATED]) for r in records], [
+            ('15.0', 1, 0, 0),
+            ('15.0', 0, 1, 0),
+            ('15.0', 0, 0, 1),
+            ('15.0', 1, 0, 0),
+        ])
+
+    def test_unchanged_blobs_not_reparsed(self):
+        """Test that revisions are parsed once per distinct content and cached."""
+        from unittest import mock
+
+        with mock.patch.object(omm, 'history_counts', wraps=omm.history_counts) as history_counts:
+            records = omm.history_records(self.yaml_file, jobs=1)
+        # The first and last revision have the same content
+        self.assertEqual(history_counts.call_count, 3)
+
+        with mock.patch.object(omm, 'history_counts', side_effect=AssertionError) as history_counts:
+            self.assertEqual(omm.history_records(self.yaml_file, jobs=1), records)
+
+    def test_not_a_repository(self):
+        """Test the error reported for files outside a git repository."""
+        import io
+        import shutil
+        from contextlib import redirect_stdout
+
+        shutil.rmtree(os.path.join(self.temp_dir, '.git'))
+        output = io.StringIO()
+        with redirect_stdout(output):
+            omm.history(self.yaml_file)
+        self.assertIn('Error:', output.getvalue())
+
+
+class TestOMMStorage(unittest.TestCase):
+    """Test cases for the YAML load/dump storage layer."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.test_modules = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_modules.yaml')
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def sample_data(self):
+        """Helper method returning data exercising quoting, unicode and long lines."""
+        data = omm.load_yaml(self.test_modules, Loader=yaml.SafeLoader)
+        data.append({
+            'name': 'x' * 300,
+            'author': "O'Brien: \"quoted\", Müller & 中文 " + 'long ' * 100,
+            '15.0': {
+                'state': '',
+                'auto_install': True,
+                'evaluation': "doesn't matter",
+                'comment': 'multi\nline comment'
+            }
+        })
+        return data
+
+    def read_file(self, path):
+        """Helper method to read a file as bytes."""
+        with open(path, 'rb') as f:
+            return f.read()
+
+    @unittest.skipUnless(yaml.__with_libyaml__, 'PyYAML built without LibYAML')
+    def test_libyaml_and_python_dump_identical(self):
+        """Test that LibYAML and pure-Python dumpers write byte-identical files."""
+        data = self.sample_data()
+        python_file = os.path.join(self.temp_dir, 'python.yaml')
+        libyaml_file = os.path.join(self.temp_dir, 'libyaml.yaml')
+
+        omm.dump_yaml(data, python_file, Dumper=yaml.SafeDumper)
+        omm.dump_yaml(data, libyaml_file, Dumper=yaml.CSafeDumper)
+
+        self.assertEqual(self.read_file(python_file), self.read_file(libyaml_file))
+
+    def test_dump_matches_previous_settings(self):
+        """Test that the storage layer matches the previous yaml.dump settings."""
+        data = self.sample_data()
+        yaml_file = os.path.join(self.temp_dir, 'modules.yaml')
+        omm.dump_yaml(data, yaml_file)
+
+        expected = yaml.dump(data, default_flow_style=False, sort_keys=False, width=float('inf'))
+        self.assertEqual(self.read_file(yaml_file), expected.encode())
+
+    @unittest.skipUnless(yaml.__with_libyaml__, 'PyYAML built without LibYAML')
+    def test_libyaml_and_python_load_identical(self):
+        """Test that LibYAML and pure-Python loaders return the same data."""
+        self.assertEqual(
+            omm.load_yaml(self.test_modules, Loader=yaml.SafeLoader),
+            omm.load_yaml(self.test_modules, Loader=yaml.CSafeLoader)
+        )
+
+
+class TestOMMCache(unittest.TestCase):
+    """Test cases for the snapshot cache used by read-only commands."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        from unittest import mock
+
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'modules.yaml')
+        patcher = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': os.path.join(self.temp_dir, 'cache')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache_file = omm.cache_path(self.yaml_file)
+        self.modules = [
+            {
+                'name': 'cached_module',
+                'author': 'Test Author',
+                '12.0': {
+                    'state': 'installed',
+                    'auto_install': 'f',
+                    'evaluation': 'required',
+                    'comment': ''
+                }
+            }
+        ]
+        with open(self.yaml_file, 'w') as f:
+            yaml.dump(self.modules, f, default_flow_style=False, sort_keys=False)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_snapshot_reused(self):
+        """Test that a second load is served from the snapshot without parsing."""
+        from unittest import mock
+
+        self.assertEqual(omm.load_yaml_cached(self.yaml_file), self.modules)
+        self.assertTrue(os.path.exists(self.cache_file))
+
+        with mock.patch.object(yaml, 'load', side_effect=AssertionError('YAML parsed')):
+            self.assertEqual(omm.load_yaml_cached(self.yaml_file), self.modules)
+
+    def test_expired_snapshots_pruned(self):
+        """Test that cache files not written for a long time are removed."""
+        from unittest import mock
+
+        cache_dir = os.path.dirname(self.cache_file)
+        os.makedirs(cache_dir)
+        expired_file = os.path.join(cache_dir, 'expired.omm-cache')
+        recent_file = os.path.join(cache_dir, 'recent.omm-cache')
+        for cache_file in (expired_file, recent_file):
+            with open(cache_file, 'wb') as f:
+                f.write(b'snapshot')
+        os.utime(expired_file, (0, 0))
+
+        with mock.patch.object(omm, 'cache_pruned', False):
+            omm.load_yaml_cached(self.yaml_file)
+
+        self.assertEqual(sorted(os.listdir(cache_dir)), sorted([os.path.basename(self.cache_file), 'recent.omm-cache']))
+
+    def test_snapshot_outside_working_tree(self):
+        """Test that the snapshot is kept in the user's cache directory."""
+        omm.load_yaml_cached(self.yaml_file)
+
+        self.assertTrue(self.cache_file.startswith(os.path.join(self.temp_dir, 'cache', 'omm') + os.sep))
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['cache', 'modules.yaml'])
+
+    def test_tampered_snapshot_ignored(self):
+        """Test that a planted pickle is neither executed nor used."""
+        import pickle
+
+        class Exploit:
+            def __reduce__(self):
+                return (os.mkdir, (os.path.join(self.temp_dir, 'exploited'),))
+
+        Exploit.temp_dir = self.temp_dir
+        os.makedirs(os.path.dirname(self.cache_file))
+        for cache_file in [self.cache_file, os.path.join(self.temp_dir, '.modules.yaml.omm-cache')]:
+            with open(cache_file, 'wb') as f:
+                pickle.dump((None, Exploit()), f)
+        history_file = omm.cache_path(self.yaml_file, omm.HISTORY_CACHE_SUFFIX)
+        with open(history_file, 'wb') as f:
+            f.write(omm.history_cache_header() + pickle.dumps(Exploit()))
+
+        self.assertEqual(omm.load_yaml_cached(self.yaml_file), self.modules)
+        self.assertEqual(omm.load_history_cache(history_file), {})
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'exploited')))
+
+    def test_snapshot_invalidated_on_change(self):
+        """Test that changing the YAML file invalidates the snapshot."""
+        omm.load_yaml_cached(self.yaml_file)
+
+        self.modules[0]['12.0']['state'] = 'not installed'
+        with open(self.yaml_file, 'w') as f:
+            yaml.dump(self.modules, f, default_flow_style=False, sort_keys=False)
+
+        result = omm.load_yaml_cached(self.yaml_file)
+        self.assertEqual(result[0]['12.0']['state'], 'not installed')
+
+    def test_corrupt_snapshot_ignored(self):
+        """Test that an unreadable snapshot falls back to parsing the YAML."""
+        os.makedirs(os.path.dirname(self.cache_file))
+        with open(self.cache_file, 'wb') as f:
+            f.write(b'not a snapshot')
+
+        self.assertEqual(omm.load_yaml_cached(self.yaml_file), self.modules)
+
+    def test_no_cache_and_clear(self):
+        """Test that use_cache=False bypasses the snapshot and clear_cache removes it."""
+        import io
+        from contextlib import redirect_stdout
+
+        omm.load_yaml_cached(self.yaml_file, use_cache=False)
+        self.assertFalse(os.path.exists(self.cache_file))
+
+        omm.load_yaml_cached(self.yaml_file)
+        with redirect_stdout(io.StringIO()):
+            omm.clear_cache(self.yaml_file)
+        self.assertFalse(os.path.exists(self.cache_file))
+
+
+class TestOMMVersionKeys(unittest.TestCase):
+    """Test cases for normalized version keys."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'test.yaml')
+        self.test_modules = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_modules.yaml')
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_duplicate_float_and_string_keys_merged(self):
+        """Test that 12.0 and '12.0' keys are merged on load."""
+        result = {m['name']: m for m in omm.load_modules(self.test_modules)}
+
+        for module in result.values():
+            self.assertEqual(list(module), ['name', 'author', '12.0'])
+            self.assertIsInstance(list(module)[2], omm.VersionKey)
+
+        # The string key wins, empty fields are filled from the float key
+        self.assertEqual(result['abandoned_carts']['12.0']['evaluation'], 'required')
+        self.assertEqual(result['abandoned_carts']['12.0']['comment'], 'Critical module for cart recovery')
+        self.assertEqual(result['old_module']['12.0']['state'], 'not installed')
+        self.assertEqual(result['old_module']['12.0']['auto_install'], 'f')
+        self.assertEqual(result['old_module']['12.0']['evaluation'], 'desired')
+
+    def test_version_sort_key(self):
+        """Test that versions sort numerically and keys compare like strings."""
+        versions = [omm.version_key(v) for v in ['9.0', 17.0, '12.0', 'saas~17.1']]
+        versions.sort(key=lambda v: v.sort_key, reverse=True)
+
+        self.assertEqual(versions, ['saas~17.1', '17.0', '12.0', '9.0'])
+        self.assertEqual(omm.version_key(12.0), '12.0')
+        self.assertEqual(hash(omm.version_key(12.0)), hash('12.0'))
+
+    def test_version_key_pickle(self):
+        """Test that version keys survive the snapshot cache."""
+        import pickle
+
+        key = pickle.loads(pickle.dumps(omm.version_key('15.0')))
+        self.assertIsInstance(key, omm.VersionKey)
+        self.assertEqual(key.sort_key, (15, 0))
+
+    def test_written_file_has_single_string_key(self):
+        """Test that writing the file replaces duplicate keys by one string key."""
+        import io
+        import shutil
+        from contextlib import redirect_stdout
+
+        shutil.copy(self.test_modules, self.yaml_file)
+        with redirect_stdout(io.StringIO()):
+            omm.add_version(self.yaml_file, '15.0')
+
+        with open(self.yaml_file) as f:
+            content = f.read()
+        self.assertNotIn('\n  12.0:', content)
+        self.assertEqual(content.count("\n  '12.0':"), 5)
+        self.assertLess(content.index("'15.0':"), content.index("'12.0':"))
+
+
+class TestOMMIncrementalWrite(unittest.TestCase):
+    """Test cases for writing only changed entries of modules.yaml."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'modules.yaml')
+        self.csv_file = os.path.join(self.temp_dir, 'modules.csv')
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def create_modules(self, count):
+        """Helper method returning modules installed in 12.0."""
+        return [{
+            'name': f'module_{i:03d}',
+            'author': 'Test Author',
+            '12.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': 'required', 'comment': ''}
+        } for i in range(count)]
+
+    def import_csv(self, names):
+        """Helper method importing installed modules into the YAML file."""
+        import io
+        from contextlib import redirect_stdout
+
+        with open(self.csv_file, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(['name', 'author', 'state', 'auto_install'])
+            for name in names:
+                writer.writerow([name, 'Test Author', 'installed', 'f'])
+        with redirect_stdout(io.StringIO()):
+            omm.process_csv(self.csv_file, self.yaml_file, '12.0')
+
+    def read_file(self):
+        """Helper method to read the YAML file as text."""
+        with open(self.yaml_file) as f:
+            return f.read()
+
+    def test_incremental_matches_full_dump(self):
+        """Test that the incremental writer produces the same file as a full dump."""
+        modules = self.create_modules(50)
+        omm.dump_yaml(modules, self.yaml_file)
+
+        # Drop one module, add one in the middle and keep the rest
+        names = [m['name'] for m in modules if m['name'] != 'module_010'] + ['module_025a']
+        self.import_csv(names)
+
+        result = self.read_file()
+        expected_file = os.path.join(self.temp_dir, 'expected.yaml')
+        omm.dump_yaml(omm.load_yaml(self.yaml_file), expected_file)
+        with open(expected_file) as f:
+            self.assertEqual(result, f.read())
+
+        self.assertIn("- name: module_010\n  author: Test Author\n  '12.0':\n    state: not installed\n", result)
+        self.assertLess(result.index('module_025a'), result.index('module_026'))
+
+    def test_unchanged_entries_kept_verbatim(self):
+        """Test that unchanged entries are not re-emitted."""
+        with open(self.yaml_file, 'w') as f:
+            f.write(
+                "- name: hand_edited\n"
+                "  author: Test Author\n"
+                "  '12.0':\n"
+                "    state: installed\n"
+                "    auto_install: f\n"
+                "    evaluation: \"required\"  # checked with finance\n"
+                "    comment: ''\n"
+                "- name: removed\n"
+                "  author: Test Author\n"
+                "  '12.0':\n"
+                "    state: installed\n"
+                "    auto_install: f\n"
+                "    evaluation: \"desired\"\n"
+                "    comment: ''\n"
+            )
+
+        self.import_csv(['hand_edited'])
+
+        result = self.read_file()
+        self.assertIn('evaluation: "required"  # checked with finance\n', result)
+        self.assertIn("- name: removed\n  author: Test Author\n  '12.0':\n    state: not installed\n", result)
+        self.assertIn('evaluation: desired\n', result)
+
+    def test_legacy_keys_rewritten(self):
+        """Test that entries with float version keys are re-emitted with string keys."""
+        with open(self.yaml_file, 'w') as f:
+            yaml.dump(self.create_modules(2), f, default_flow_style=False, sort_keys=False)
+        with open(self.yaml_file) as f:
+            content = f.read().replace("'12.0':", '12.0:', 1)
+        with open(self.yaml_file, 'w') as f:
+            f.write(content)
+
+        self.import_csv(['module_000', 'module_001'])
+
+        self.assertEqual(self.read_file().count("'12.0':"), 2)
+
+    def test_missing_final_newline(self):
+        """Test that entries are appended to a file without a final newline."""
+        with open(self.yaml_file, 'w') as f:
+            f.write(
+                "- name: aaa\n"
+                "  author: Test Author\n"
+                "  '12.0':\n"
+                "    state: not installed\n"
+                "    auto_install: f\n"
+                "    evaluation: ''\n"
+                "    comment: ''"
+            )
+
+        self.import_csv(['zzz'])
+
+        self.assertEqual([entry['name'] for entry in omm.load_yaml(self.yaml_file)], ['aaa', 'zzz'])
+        self.assertIn("    comment: ''\n- name: zzz\n", self.read_file())
+
+    def test_removed_null_version_written(self):
+        """Test that removing a version stored as null rewrites the entry."""
+        with open(self.yaml_file, 'w') as f:
+            f.write(
+                "- name: aaa\n"
+                "  author: Test Author\n"
+                "  '12.0':\n"
+                "    state: installed\n"
+                "    auto_install: f\n"
+                "    evaluation: ''\n"
+                "    comment: ''\n"
+                "  '15.0':\n"
+            )
+
+        with omm.ModuleDB(self.yaml_file) as db:
+            db.remove_version('15.0')
+
+        self.assertNotIn('15.0', self.read_file())
+
+    def test_atomic_write(self):
+        """Test that writes keep the file mode and leave no temporary files."""
+        import stat
+
+        omm.dump_yaml(self.create_modules(3), self.yaml_file)
+        os.chmod(self.yaml_file, 0o640)
+
+        self.import_csv(['module_001'])
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.yaml_file).st_mode), 0o640)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['modules.csv', 'modules.yaml'])
+
+
+class TestOMMShardedStorage(unittest.TestCase):
+    """Test cases for the sharded directory storage."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'modules.yaml')
+        self.sharded_dir = os.path.join(self.temp_dir, 'modules') + os.sep
+        self.csv_file = os.path.join(self.temp_dir, 'modules.csv')
+        modules = []
+        for name, author in [('account', 'Odoo S.A.'), ('account_banking', 'OCA'), ('sale', 'Odoo S.A.'), ('web_widget', 'OCA')]:
+            modules.append({
+                'name': name,
+                'author': author,
+                '12.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': 'required', 'comment': ''}
+            })
+        omm.dump_yaml(modules, self.yaml_file)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def run_quietly(self, function, *args):
+        """Helper method calling a function with stdout captured."""
+        import io
+        from contextlib import redirect_stdout
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            function(*args)
+        return output.getvalue()
+
+    def shard_path(self, shard):
+        """Helper method returning the path of a shard file."""
+        return os.path.join(self.sharded_dir, 'shards', f'{shard}.yaml')
+
+    def test_convert_round_trip(self):
+        """Test converting to a sharded directory and back."""
+        self.run_quietly(omm.convert, self.yaml_file, self.sharded_dir)
+
+        self.assertEqual(sorted(os.listdir(os.path.join(self.sharded_dir, 'shards'))), [
+            'account.yaml', 'account_banking.yaml', 'sale.yaml', 'web_widget.yaml'
+        ])
+        index = omm.load_yaml(os.path.join(self.sharded_dir, 'index.yaml'))
+        self.assertEqual(index['prefix_length'], 0)
+        self.assertEqual(index['modules']['web_widget'], 'OCA')
+
+        round_trip = os.path.join(self.temp_dir, 'round_trip.yaml')
+        self.run_quietly(omm.convert, self.sharded_dir, round_trip)
+        with open(self.yaml_file) as expected, open(round_trip) as result:
+            self.assertEqual(result.read(), expected.read())
+
+    def test_prefix_shards(self):
+        """Test grouping modules by name prefix."""
+        self.run_quietly(omm.convert, self.yaml_file, self.sharded_dir, 2)
+
+        self.assertEqual(sorted(os.listdir(os.path.join(self.sharded_dir, 'shards'))), ['ac.yaml', 'sa.yaml', 'we.yaml'])
+        self.assertEqual([m['name'] for m in omm.load_yaml(self.shard_path('ac'))], ['account', 'account_banking'])
+
+    def test_import_writes_changed_shards_only(self):
+        """Test that imports into a sharded directory only rewrite touched shards."""
+        self.run_quietly(omm.convert, self.yaml_file, self.sharded_dir)
+        # Backdate all files to detect rewrites
+        for root, dirs, files in os.walk(self.sharded_dir):
+            for filename in files:
+                os.utime(os.path.join(root, filename), ns=(0, 0))
+
+        with open(self.csv_file, 'w') as f:
+            f.write('name;author;state;auto_install\n')
+            f.write('account;Odoo S.A.;installed;f\n')
+            f.write('account_banking;OCA;installed;f\n')
+            f.write('web_widget;OCA;installed;f\n')
+        self.run_quietly(omm.process_csv, self.csv_file, self.sharded_dir, '12.0')
+
+        rewritten = sorted(
+            filename for root, dirs, files in os.walk(self.sharded_dir) for filename in files
+            if os.stat(os.path.join(root, filename)).st_mtime_ns != 0
+        )
+        self.assertEqual(rewritten, ['sale.yaml'])
+        self.assertEqual(omm.load_yaml(self.shard_path('sale'))[0]['12.0']['state'], 'not installed')
+
+        # New modules create a shard and update the index
+        with open(self.csv_file, 'a') as f:
+            f.write('stock;Odoo S.A.;installed;f\n')
+        self.run_quietly(omm.process_csv, self.csv_file, self.sharded_dir, '12.0')
+        self.assertTrue(os.path.exists(self.shard_path('stock')))
+        self.assertIn('stock', omm.load_yaml(os.path.join(self.sharded_dir, 'index.yaml'))['modules'])
+
+    def test_analyse_loads_matching_shards_only(self):
+        """Test that author filters only load shards with matching modules."""
+        from unittest import mock
+
+        self.run_quietly(omm.convert, self.yaml_file, self.sharded_dir)
+
+        loaded = []
+        original_load = omm.YAMLStorage.load
+
+        def tracking_load(storage, *args, **kwargs):
+            loaded.append(os.path.basename(storage.path))
+            return original_load(storage, *args, **kwargs)
+
+        with mock.patch.object(omm.YAMLStorage, 'load', tracking_load):
+            output = self.run_quietly(omm.analyse, self.sharded_dir, '12.0', ['oca'])
+
+        self.assertEqual(sorted(loaded), ['account_banking.yaml', 'web_widget.yaml'])
+        self.assertIn('Required and migrated modules:', output)
+        self.assertIn('2 modules', output)
+
+    def test_version_commands(self):
+        """Test that add-version and remove-version work on sharded directories."""
+        self.run_quietly(omm.convert, self.yaml_file, self.sharded_dir)
+
+        self.run_quietly(omm.add_version, self.sharded_dir, '15.0')
+        self.assertIn('15.0', omm.load_yaml(self.shard_path('sale'))[0])
+
+        self.run_quietly(omm.remove_version, self.sharded_dir, '12.0')
+        self.assertEqual(list(omm.load_yaml(self.shard_path('sale'))[0]), ['name', 'author', '15.0'])
+
+
+class TestOMMSQLiteStorage(unittest.TestCase):
+    """Test cases for the SQLite storage."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'modules.yaml')
+        self.sqlite_file = os.path.join(self.temp_dir, 'modules.sqlite')
+        self.csv_file = os.path.join(self.temp_dir, 'modules.csv')
+        modules = []
+        for i, (evaluation, state_12, state_15) in enumerate([
+            ('required', 'installed', 'not installed'),
+            ('required', 'installed', 'installed'),
+            ('desired', 'installed', 'not installed'),
+            ('not desired', 'not installed', 'installed'),
+            ('not required', 'installed', 'installed'),
+            ('', 'installed', 'installed'),
+        ]):
+            modules.append({
+                'name': f'module_{i}',
+                'author': 'Müller GmbH' if i % 2 else 'Odoo Community Association (OCA)',
+                '15.0': {'state': state_15, 'auto_install': 'f', 'evaluation': evaluation, 'comment': f'Comment {i}'},
+                '12.0': {'state': state_12, 'auto_install': 't', 'evaluation': '', 'comment': ''}
+            })
+        modules.append({'name': 'no_versions', 'author': 'Test Author'})
+        omm.dump_yaml(modules, self.yaml_file)
+        self.run_quietly(omm.convert, self.yaml_file, self.sqlite_file)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def run_quietly(self, function, *args):
+        """Helper method calling a function with stdout captured."""
+        import io
+        from contextlib import redirect_stdout
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            function(*args)
+        return output.getvalue()
+
+    def test_convert_round_trip(self):
+        """Test that converting to SQLite and back is lossless."""
+        round_trip = os.path.join(self.temp_dir, 'round_trip.yaml')
+        self.run_quietly(omm.convert, self.sqlite_file, round_trip)
+
+        with open(self.yaml_file) as expected, open(round_trip) as result:
+            self.assertEqual(result.read(), expected.read())
+
+    def test_convert_round_trip_irregular_entries(self):
+        """Test that null values, key order and null versions survive a round trip."""
+        yaml_file = os.path.join(self.temp_dir, 'irregular.yaml')
+        sqlite_file = os.path.join(self.temp_dir, 'irregular.sqlite')
+        round_trip = os.path.join(self.temp_dir, 'round_trip.yaml')
+        with open(yaml_file, 'w') as f:
+            f.write(
+                "- name: irregular\n"
+                "  author: Test Author\n"
+                "  '16.0':\n"
+                "  '15.0':\n"
+                "    note: checked\n"
+                "    state: installed\n"
+                "    auto_install: f\n"
+                "    evaluation: required\n"
+                "    comment: null\n"
+                "  '12.0':\n"
+                "    state: installed\n"
+            )
+        self.run_quietly(omm.convert, yaml_file, sqlite_file)
+        self.run_quietly(omm.convert, sqlite_file, round_trip)
+
+        self.assertEqual(omm.load_yaml(round_trip), omm.load_yaml(yaml_file))
+        self.assertEqual([list(entry[version] or {}) for entry in omm.load_yaml(round_trip) for version in ('15.0', '12.0')], [
+            ['note', 'state', 'auto_install', 'evaluation', 'comment'], ['state'],
+        ])
+
+    def test_database_without_layout(self):
+        """Test that databases written before the layout column are still read."""
+        import sqlite3
+        import contextlib
+
+        sqlite_file = os.path.join(self.temp_dir, 'old.sqlite')
+        with contextlib.closing(sqlite3.connect(sqlite_file)) as connection, connection:
+            connection.executescript(omm.SQLiteStorage.schema.replace('layout TEXT,', ''))
+            connection.execute("INSERT INTO modules VALUES (1, 'old_module', 'OCA')")
+            connection.execute("INSERT INTO versions VALUES (1, '15.0', 'installed', 'f', 'required', NULL, NULL)")
+
+        self.assertEqual(omm.open_storage(sqlite_file).load(), [
+            {'name': 'old_module', 'author': 'OCA', '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': 'required'}},
+        ])
+
+    def test_analyse_matches_yaml(self):
+        """Test that SQL analyse queries report the same groups as the YAML storage."""
+        for include_authors, exclude_authors in [(None, None), (['müller'], None), (None, ['OCA'])]:
+            self.assertEqual(
+                self.run_quietly(omm.analyse, self.sqlite_file, '15.0', include_authors, exclude_authors),
+                self.run_quietly(omm.analyse, self.yaml_file, '15.0', include_authors, exclude_authors, False)
+            )
+
+        output = self.run_quietly(omm.analyse, self.sqlite_file, '15.0', ['MÜLLER'])
+        self.assertIn('Not evaluated: 1 modules', output)
+        self.assertNotIn('module_0', output)
+
+    def test_compare_matches_yaml(self):
+        """Test that the SQL version queries report the same differences as the YAML storage."""
+        output = self.run_quietly(omm.compare_versions, self.sqlite_file, '12.0', '15.0')
+        self.assertEqual(output, self.run_quietly(omm.compare_versions, self.yaml_file, '12.0', '15.0', False))
+        self.assertEqual(output.count('Changed:'), 6)
+
+        output = self.run_quietly(omm.compare_versions, self.sqlite_file, '12.0', '15.0', True, None, None, 'text', None, None, ['state'])
+        self.assertEqual(output.count('Changed:'), 3)
+        self.assertEqual(output, self.run_quietly(omm.compare_versions, self.yaml_file, '12.0', '15.0', False, None, None, 'text', None, None, ['state']))
+
+    def test_import_and_remove_version(self):
+        """Test that writers update the SQLite database."""
+        with open(self.csv_file, 'w') as f:
+            f.write('name;author;state;auto_install\n')
+            f.write('module_0;OCA;installed;f\n')
+            f.write('new_module;New Author;installed;f\n')
+        self.run_quietly(omm.process_csv, self.csv_file, self.sqlite_file, '15.0')
+        self.run_quietly(omm.remove_version, self.sqlite_file, '12.0')
+
+        data = {m['name']: m for m in omm.open_storage(self.sqlite_file).load()}
+        self.assertEqual(data['module_0']['15.0'], {
+            'state': 'installed', 'auto_install': 'f', 'evaluation': 'required', 'comment': 'Comment 0'
+        })
+        self.assertEqual(data['module_1']['15.0']['state'], 'not installed')
+        self.assertEqual(data['new_module']['author'], 'New Author')
+        self.assertTrue(all('12.0' not in m for m in data.values()))
+
+
+class TestOMMFleet(unittest.TestCase):
+    """Test cases for fleets of tenants sharing one module catalog."""
+
+    def setUp(self):
+        """Set up a fleet with two tenants."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.fleet = os.path.join(self.temp_dir, 'fleet')
+        self.import_csv('customer_a', '12.0', [('account', 'Odoo S.A.'), ('sale', 'Odoo S.A.')])
+        self.import_csv('customer_b', '12.0', [('account', 'Odoo S.A.'), ('stock_oca', 'OCA')])
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def run_quietly(self, function, *args, **kwargs):
+        """Helper method calling a function with stdout captured."""
+        import io
+        from contextlib import redirect_stdout
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            function(*args, **kwargs)
+        return output.getvalue()
+
+    def import_csv(self, tenant, odoo_version, modules):
+        """Helper method importing installed modules into a tenant."""
+        csv_file = os.path.join(self.temp_dir, f'{tenant}.csv')
+        with open(csv_file, 'w') as f:
+            f.write('name;author;state;auto_install\n')
+            for name, author in modules:
+                f.write(f'{name};{author};installed;f\n')
+        self.run_quietly(omm.process_csv, csv_file, self.fleet, odoo_version, tenant)
+
+    def set_evaluation(self, name, odoo_version, evaluation):
+        """Helper method editing an evaluation in the catalog."""
+        catalog_file = os.path.join(self.fleet, 'catalog.yaml')
+        catalog = omm.load_yaml(catalog_file)
+        for entry in catalog:
+            if entry['name'] == name:
+                entry.setdefault(odoo_version, {'evaluation': '', 'comment': ''})['evaluation'] = evaluation
+        omm.dump_yaml(catalog, catalog_file)
+
+    def test_catalog_shared(self):
+        """Test that modules are stored once and tenants only keep their states."""
+        catalog = omm.load_yaml(os.path.join(self.fleet, 'catalog.yaml'))
+        self.assertEqual([entry['name'] for entry in catalog], ['account', 'sale', 'stock_oca'])
+        self.assertEqual(catalog[0], {'name': 'account', 'author': 'Odoo S.A.', '12.0': {'evaluation': '', 'comment': ''}})
+
+        self.assertEqual(omm.load_yaml(os.path.join(self.fleet, 'tenants', 'customer_b.yaml')), {
+            'modules': ['account', 'stock_oca'],
+            '12.0': {'installed': ['account', 'stock_oca'], 'auto_install': []}
+        })
+
+    def test_tenant_view(self):
+        """Test that a tenant loads like a module database with the catalog's evaluations."""
+        self.set_evaluation('account', '15.0', 'required')
+        self.import_csv('customer_a', '15.0', [('sale', 'Odoo S.A.')])
+
+        data = omm.open_storage(self.fleet, tenant='customer_a').load()
+        self.assertEqual([entry['name'] for entry in data], ['account', 'sale'])
+        self.assertEqual(data[0]['15.0'], {'state': 'not installed', 'auto_install': 'f', 'evaluation': 'required', 'comment': ''})
+        self.assertEqual(data[0]['12.0']['state'], 'installed')
+
+        output = self.run_quietly(omm.analyse, self.fleet, '15.0', tenant='customer_a')
+        self.assertIn('Required but not installed: 1 modules', output)
+        output = self.run_quietly(omm.analyse, self.fleet, '15.0')
+        self.assertIn('please provide a tenant', output)
+
+    def test_tenant_required(self):
+        """Test that version commands and compare work on the tenant they are given."""
+        for command in ('add-version', 'remove-version'):
+            output = self.run_quietly(omm.main, [command, self.fleet, '15.0'])
+            self.assertEqual(output, f"Error: {self.fleet} holds several databases, please provide a tenant.\n")
+
+        self.run_quietly(omm.main, ['add-version', self.fleet, '15.0', '--tenant', 'customer_a'])
+        data = omm.open_storage(self.fleet, tenant='customer_a').load()
+        self.assertEqual(data[0]['15.0'], {'state': '', 'auto_install': '', 'evaluation': '', 'comment': ''})
+
+        output = self.run_quietly(omm.main, ['compare', self.fleet, '12.0', '15.0', '--no-cache', '--tenant', 'customer_a'])
+        self.assertIn("Changed: account: state 'installed' -> ''", output)
+        self.assertIn('Summary 12.0 -> 15.0: 0 added, 0 removed, 2 changed', output)
+
+    def test_tenant_of_other_database(self):
+        """Test that a tenant is rejected for module databases which aren't fleets."""
+        yaml_file = os.path.join(self.temp_dir, 'modules.yaml')
+        omm.dump_yaml([], yaml_file)
+
+        output = self.run_quietly(omm.analyse, yaml_file, '15.0', tenant='customer_a')
+        self.assertEqual(output, f"Error: {yaml_file} is not a fleet directory, --tenant is only supported for fleets.\n")
+
+    def test_remove_version(self):
+        """Test that a version removed from a tenant is gone after reloading."""
+        self.import_csv('customer_a', '15.0', [('sale', 'Odoo S.A.')])
+        self.import_csv('customer_b', '15.0', [('account', 'Odoo S.A.')])
+
+        with omm.ModuleDB(self.fleet, 'customer_a') as db:
+            db.remove_version('15.0')
+
+        data = omm.open_storage(self.fleet, tenant='customer_a').load()
+        self.assertEqual([list(entry) for entry in data], [['name', 'author', '12.0']] * 2)
+        data = omm.open_storage(self.fleet, tenant='customer_b').load()
+        self.assertEqual(data[0]['15.0']['state'], 'installed')
+
+    def test_states_round_trip(self):
+        """Test that states other than installed and not installed are kept per tenant."""
+        csv_file = os.path.join(self.temp_dir, 'states.csv')
+        with open(csv_file, 'w') as f:
+            f.write('name;author;state;auto_install\n')
+            f.write('account;Odoo S.A.;installed;t\n')
+            f.write('sale;Odoo S.A.;to upgrade;f\n')
+            f.write('stock_oca;OCA;uninstallable;f\n')
+        self.run_quietly(omm.process_csv, csv_file, self.fleet, '15.0', 'customer_a')
+        self.run_quietly(omm.main, ['add-version', self.fleet, '16.0', '--tenant', 'customer_a'])
+
+        data = {entry['name']: entry for entry in omm.open_storage(self.fleet, tenant='customer_a').load()}
+        self.assertEqual([(name, entry['15.0']['state'], entry['15.0']['auto_install']) for name, entry in data.items()], [
+            ('account', 'installed', 't'), ('sale', 'to upgrade', 'f'), ('stock_oca', 'uninstallable', 'f'),
+        ])
+        self.assertEqual(data['sale']['12.0']['state'], 'installed')
+        self.assertEqual(data['stock_oca']['12.0']['state'], 'not installed')
+        self.assertEqual({entry['16.0']['state'] for entry in data.values()}, {''})
+
+    def test_new_tenant_message(self):
+        """Test that importing a new tenant into an existing fleet reports the tenant."""
+        csv_file = os.path.join(self.temp_dir, 'customer_c.csv')
+        with open(csv_file, 'w') as f:
+            f.write('name;author;state;auto_install\naccount;Odoo S.A.;installed;f\n')
+
+        output = self.run_quietly(omm.process_csv, csv_file, self.fleet, '12.0', 'customer_c')
+        self.assertEqual(output, f"Tenant customer_c not found. Created it in {self.fleet} with the data.\n")
+        output = self.run_quietly(omm.process_csv, csv_file, self.fleet, '12.0', 'customer_c')
+        self.assertEqual(output, f"Data appended/merged to {self.fleet} successfully.\n")
+
+    def test_all_tenants(self):
+        """Test the analysis aggregated over all tenants."""
+        import json
+
+        self.set_evaluation('account', '12.0', 'required')
+        self.set_evaluation('stock_oca', '12.0', 'not desired')
+
+        output = self.run_quietly(omm.analyse_tenants, self.fleet, '12.0', use_cache=False)
+        self.assertIn('NE', output.splitlines()[0])
+        self.assertIn('Not evaluated: 1 modules', output)
+        self.assertIn('stock_oca (1)', output)
+
+        output = self.run_quietly(omm.analyse_tenants, self.fleet, '12.0', use_cache=False, output_format='ndjson')
+        self.assertEqual([json.loads(line) for line in output.splitlines()], [
+            {'tenant': 'customer_a', 'name': 'account', 'author': 'Odoo S.A.', '12.0': 'Required and migrated'},
+            {'tenant': 'customer_a', 'name': 'sale', 'author': 'Odoo S.A.', '12.0': 'Not evaluated'},
+            {'tenant': 'customer_b', 'name': 'account', 'author': 'Odoo S.A.', '12.0': 'Required and migrated'},
+            {'tenant': 'customer_b', 'name': 'stock_oca', 'author': 'OCA', '12.0': 'Not desired but installed'},
+        ])
+
+
+class TestOMMAuthorFilter(unittest.TestCase):
+    """Test cases for the compiled author filter."""
+
+    def test_include_and_exclude(self):
+        """Test case-insensitive partial matching of include and exclude terms."""
+        author_filter = omm.AuthorFilter(['oca', 'NITROKEY'], ['odoo s.a.'])
+
+        self.assertTrue(author_filter('Nitrokey GmbH, Odoo Community Association (OCA)'))
+        self.assertTrue(author_filter('Odoo Community Association (OCA)'))
+        self.assertFalse(author_filter('Odoo S.A., Odoo Community Association (OCA)'))
+        self.assertFalse(author_filter('Some Author'))
+        self.assertFalse(author_filter(None))
+
+    def test_special_characters_and_case_folding(self):
+        """Test that terms are matched literally and case-folded."""
+        author_filter = omm.AuthorFilter(['(oca)', 'STRASSE'])
+
+        self.assertTrue(author_filter('Odoo Community Association (OCA)'))
+        self.assertFalse(author_filter('OCA'))
+        self.assertTrue(author_filter('Hauptstraße GmbH'))
+
+    def test_memoized_per_author(self):
+        """Test that each distinct author is only matched once."""
+        from unittest import mock
+
+        author_filter = omm.AuthorFilter(['oca'])
+        include = mock.Mock(wraps=author_filter.include)
+        author_filter.include = include
+
+        for _ in range(1000):
+            author_filter('Odoo Community Association (OCA)')
+            author_filter('Odoo S.A.')
+
+        self.assertEqual(include.search.call_count, 2)
+
+    def test_empty_filter(self):
+        """Test that a filter without terms is inactive and matches everything."""
+        author_filter = omm.AuthorFilter()
+
+        self.assertFalse(author_filter)
+        self.assertTrue(author_filter('Anyone'))
+
+    def test_compare_with_author_filter(self):
+        """Test that compare only reports modules of matching authors."""
+        import io
+        import shutil
+        from contextlib import redirect_stdout
+
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        yaml_file = os.path.join(temp_dir, 'modules.yaml')
+        omm.dump_yaml([{
+            'name': f'module_{author}',
+            'author': author,
+            '12.0': {'state': 'installed'},
+            '15.0': {'state': 'not installed'}
+        } for author in ['OCA', 'Odoo S.A.']], yaml_file)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            omm.compare_versions(yaml_file, '12.0', '15.0', False, None, ['odoo s.a.'])
+
+        self.assertIn('module_OCA', output.getvalue())
+        self.assertNotIn('module_Odoo S.A.', output.getvalue())
+
+
+class TestOMMServe(unittest.TestCase):
+    """Test cases for the serve query service."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'modules.yaml')
+        self.write_modules('required')
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def write_modules(self, evaluation):
+        omm.dump_yaml([
+            {'name': 'module_a', 'author': 'OCA',
+             '15.0': {'state': 'not installed', 'auto_install': 'f', 'evaluation': evaluation, 'comment': ''},
+             '12.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': '', 'comment': ''}},
+            {'name': 'module_b', 'author': 'Odoo S.A.',
+             '15.0': {'state': 'installed', 'auto_install': 't', 'evaluation': 'not desired', 'comment': ''}},
+        ], self.yaml_file)
+
+    def query(self, service, path, **params):
+        import json
+        revision, body = service.query(path, {name: values if isinstance(values, list) else [values] for name, values in params.items()})
+        return json.loads(body)
+
+    def test_queries(self):
+        """Test the analyse, compare, modules and versions queries."""
+        service = omm.QueryService(self.yaml_file)
+
+        analysis = self.query(service, '/analyse', version='15.0')
+        self.assertEqual(analysis['groups']['Required but not installed'], ['module_a'])
+        self.assertEqual(analysis['groups']['Not desired but installed'], ['module_b'])
+        analysis = self.query(service, '/analyse', version='15.0', exclude_authors='odoo s.a.')
+        self.assertEqual(analysis['groups']['Not desired but installed'], [])
+
+        comparison = self.query(service, '/compare', source='12.0', target='15.0', fields=['state'])
+        self.assertEqual([(d['name'], d['change']) for d in comparison['differences']], [('module_a', 'changed'), ('module_b', 'added')])
+        self.assertEqual(comparison['differences'][0]['target_state'], 'not installed')
+
+        module = self.query(service, '/modules/module_a')
+        self.assertEqual(list(module['versions']), ['15.0', '12.0'])
+        self.assertEqual(self.query(service, '/versions'), {'versions': ['12.0', '15.0']})
+
+        with self.assertRaises(ValueError):
+            service.query('/analyse', {})
+        with self.assertRaises(ValueError):
+            service.query('/compare', {'source': ['12.0'], 'target': ['15.0'], 'only': ['moved']})
+        with self.assertRaises(LookupError):
+            service.query('/modules/missing', {})
+
+    def test_cached_until_content_changes(self):
+        """Test that answers are cached per revision and query."""
+        from unittest import mock
+
+        service = omm.QueryService(self.yaml_file)
+        with mock.patch.object(omm, 'group_modules', wraps=omm.group_modules) as group_modules:
+            first = service.query('/analyse', {'version': ['15.0']})
+            self.assertEqual(service.query('/analyse', {'version': ['15.0']}), first)
+            self.assertEqual(group_modules.call_count, 1)
+
+            # Touching the file doesn't invalidate the cache
+            os.utime(self.yaml_file, ns=(0, 0))
+            self.assertEqual(service.query('/analyse', {'version': ['15.0']}), first)
+            self.assertEqual(group_modules.call_count, 1)
+
+            self.write_modules('not required')
+            revision, body = service.query('/analyse', {'version': ['15.0']})
+            self.assertEqual(group_modules.call_count, 2)
+
+        self.assertNotEqual(revision, first[0])
+        self.assertIn(b'"Required but not installed": ["module_a"]', first[1])
+        self.assertIn(b'"Required but not installed": []', body)
+
+    def test_ignored_parameters_not_cached(self):
+        """Test that parameters a query doesn't read share one cached answer."""
+        service = omm.QueryService(self.yaml_file)
+        for i in range(3):
+            service.query('/analyse', {'version': ['15.0'], '_': [str(i)]})
+            service.query('/versions', {'_': [str(i)]})
+
+        self.assertEqual(len(service.responses), 2)
+
+    def test_http(self):
+        """Test JSON responses, errors and ETags over HTTP."""
+        import json
+        import threading
+        import urllib.error
+        import urllib.request
+
+        from unittest import mock
+
+        server = omm.make_server(omm.QueryService(self.yaml_file), '127.0.0.1', 0)
+        server.RequestHandlerClass.log_message = mock.Mock()
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f'http://127.0.0.1:{server.server_port}'
+
+        with urllib.request.urlopen(f'{url}/analyse?version=15.0&include_authors=oca') as response:
+            self.assertEqual(response.headers['Content-Type'], 'application/json')
+            etag = response.headers['ETag']
+            self.assertEqual(json.load(response)['groups']['Required but not installed'], ['module_a'])
+
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            urllib.request.urlopen(urllib.request.Request(f'{url}/analyse?version=15.0', headers={'If-None-Match': etag}))
+        self.assertEqual(cm.exception.code, 304)
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            urllib.request.urlopen(f'{url}/unknown')
+        self.assertEqual(cm.exception.code, 404)
+        self.assertIn('/analyse', json.load(cm.exception)['error'])
+
+
+class TestOMMModuleDB(unittest.TestCase):
+    """Test cases for the ModuleDB library API and chained commands."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'modules.yaml')
+        self.csv_file = os.path.join(self.temp_dir, 'installed.csv')
+        omm.dump_yaml([
+            {'name': 'module_a', 'author': 'OCA', '12.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': '', 'comment': 'keep'}},
+            {'name': 'module_b', 'author': 'OCA', '12.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': '', 'comment': ''}},
+        ], self.yaml_file)
+        with open(self.csv_file, 'w') as f:
+            f.write('name;author;state;auto_install\nmodule_a;OCA;installed;f\nmodule_c;Odoo S.A.;installed;t\n')
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def load(self):
+        with open(self.yaml_file) as f:
+            return {entry['name']: entry for entry in yaml.safe_load(f)}
+
+    def test_commands_in_memory_with_single_load_and_save(self):
+        """Test that several commands share one load and one write."""
+        import io
+        from unittest import mock
+        from contextlib import redirect_stdout
+
+        output = io.StringIO()
+        with mock.patch.object(omm, 'load_module_file', wraps=omm.load_module_file) as load, \
+                mock.patch.object(omm, 'write_modules', wraps=omm.write_modules) as write, redirect_stdout(output):
+            db = omm.ModuleDB(self.yaml_file)
+            db.import_csv(self.csv_file, '12.0')
+            db.add_version('15.0')
+            db.analyse('15.0')
+            db.compare('12.0', '15.0', output_format='json')
+            self.assertEqual(write.call_count, 0)
+            db.save()
+
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(write.call_count, 1)
+        self.assertIn('Not evaluated: 3 modules', output.getvalue())
+        self.assertIn('"change": "changed"', output.getvalue())
+
+        modules = self.load()
+        self.assertEqual(list(modules), ['module_a', 'module_b', 'module_c'])
+        self.assertEqual(modules['module_a']['12.0']['comment'], 'keep')
+        self.assertEqual(modules['module_b']['12.0']['state'], 'not installed')
+        self.assertEqual(modules['module_c']['15.0'], {'state': '', 'auto_install': '', 'evaluation': '', 'comment': ''})
+
+    def test_repeated_saves(self):
+        """Test that later saves keep the changes of earlier ones."""
+        with omm.ModuleDB(self.yaml_file) as db:
+            db.import_csv(self.csv_file, '12.0')
+            db.save()
+            db.remove_version('13.0')
+            db.merge([('module_b', 'OCA', {'state': 'installed', 'auto_install': 't'})], '15.0')
+
+        modules = self.load()
+        self.assertEqual(modules['module_b']['12.0']['state'], 'not installed')
+        self.assertEqual(modules['module_b']['15.0']['auto_install'], 't')
+        self.assertIn('module_c', modules)
+
+    def test_chained_cli_commands(self):
+        """Test that chained commands load and save the file once."""
+        import io
+        from unittest import mock
+        from contextlib import redirect_stdout
+
+        output = io.StringIO()
+        with mock.patch.object(omm, 'write_modules', wraps=omm.write_modules) as write, redirect_stdout(output):
+            omm.main(['import-csv', self.csv_file, self.yaml_file, '12.0', '+', 'add-version', self.yaml_file, '15.0',
+                      '+', 'remove-version', self.yaml_file, '12.0', '+', 'analyse', self.yaml_file, '15.0'])
+
+        self.assertEqual(write.call_count, 1)
+        self.assertIn('Not evaluated: 3 modules', output.getvalue())
+        self.assertIn(f'Saved the changes to {self.yaml_file}.', output.getvalue())
+        self.assertEqual([list(entry) for entry in self.load().values()], [['name', 'author', '15.0']] * 3)
+
+    def test_failed_chain_saves_nothing(self):
+        """Test that nothing is written when a chained command fails."""
+        import io
+        from contextlib import redirect_stdout
+
+        with open(self.yaml_file) as f:
+            content = f.read()
+        output = io.StringIO()
+        with redirect_stdout(output):
+            omm.main(['add-version', self.yaml_file, '15.0', '+', 'import-csv', 'missing.csv', self.yaml_file, '15.0'])
+            omm.main(['add-version', self.yaml_file, '15.0', '+', 'convert', self.yaml_file, 'other.yaml'])
+
+        self.assertIn('An error occurred', output.getvalue())
+        self.assertIn('can be chained', output.getvalue())
+        with open(self.yaml_file) as f:
+            self.assertEqual(f.read(), content)
+
+
+class TestOMMModel(unittest.TestCase):
+    """Test cases for the Module and VersionRecord model."""
+
+    def test_round_trip_is_lossless(self):
+        """Test that unusual entries convert back to the same dicts."""
+        data = [
+            {
+                'name': 'module_a',
+                'author': 'OCA',
+                '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': 'required', 'comment': ''},
+                '12.0': {'evaluation': 'desired', 'state': 'custom state', 'task': 'migrate'},
+                '11.0': None,
+            },
+            {'name': 'module_b', 'author': 'OCA', '15.0': {}},
+        ]
+        omm.normalize_modules(data)
+
+        modules = omm.modules_from_data(data)
+
+        self.assertEqual(omm.modules_to_data(modules), data)
+        self.assertEqual(list(modules[0].to_dict()['12.0']), ['evaluation', 'state', 'task'])
+        self.assertIsNone(modules[0].versions['11.0'])
+
+    def test_states_and_values_are_shared(self):
+        """Test that known states are enum members and repeated values interned."""
+        author = ''.join(['Odoo Community ', 'Association (OCA)'])
+        first = omm.VersionRecord.from_dict({'state': 'installed', 'auto_install': 'f', 'evaluation': 'required', 'comment': ''})
+        second = omm.Module('module_b', author, {'15.0': omm.VersionRecord('to upgrade')})
+
+        self.assertIs(first.state, omm.ModuleState.INSTALLED)
+        self.assertEqual(first.get('state'), 'installed')
+        self.assertIs(second.versions['15.0'].state, omm.ModuleState.TO_UPGRADE)
+        self.assertIs(second.author, omm.Module('module_c', 'Odoo Community Association (OCA)').author)
+        self.assertIs(first.layout, second.versions['15.0'].layout)
+        self.assertFalse(hasattr(first, '__dict__'))
+
+    def test_pickle(self):
+        """Test that modules survive the snapshot cache."""
+        import pickle
+
+        module = omm.Module.from_dict({'name': 'module_a', 'author': 'OCA', '15.0': {'state': 'installed', 'extra': 1}})
+
+        copy = pickle.loads(pickle.dumps(module))
+
+        self.assertEqual(copy, module)
+        self.assertIs(copy.versions['15.0'].state, omm.ModuleState.INSTALLED)
+
+    def test_import_writes_same_file(self):
+        """Test that importing through the model writes the file like before."""
+        import io
+        import shutil
+        from contextlib import redirect_stdout
+
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        yaml_file = os.path.join(temp_dir, 'modules.yaml')
+        csv_file = os.path.join(temp_dir, 'modules.csv')
+        omm.dump_yaml([
+            {'name': 'module_a', 'author': 'OCA', '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': 'required', 'comment': 'keep'}},
+            {'name': 'module_b', 'author': 'OCA', '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': '', 'comment': ''}},
+        ], yaml_file)
+        with open(csv_file, 'w') as f:
+            f.write('name;author;state;auto_install\nmodule_a;OCA;installed;t\nmodule_c;Odoo S.A.;installed;f\n')
+
+        with redirect_stdout(io.StringIO()):
+            omm.process_csv(csv_file, yaml_file, '15.0')
+
+        with open(yaml_file) as f:
+            self.assertEqual(yaml.safe_load(f), [
+                {'name': 'module_a', 'author': 'OCA', '15.0': {'state': 'installed', 'auto_install': 't', 'evaluation': 'required', 'comment': 'keep'}},
+                {'name': 'module_b', 'author': 'OCA', '15.0': {'state': 'not installed', 'auto_install': 'f', 'evaluation': '', 'comment': ''}},
+                {'name': 'module_c', 'author': 'Odoo S.A.', '15.0': {'state': 'installed', 'auto_install': 'f', 'evaluation': '', 'comment': ''}},
+            ])
+
+
+class TestOMMTimings(unittest.TestCase):
+    """Test cases for the --timings and --profile instrumentation."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'modules.yaml')
+        self.csv_file = os.path.join(self.temp_dir, 'modules.csv')
+        omm.dump_yaml([{'name': 'old_module', 'author': 'OCA', '12.0': {'state': 'installed'}}], self.yaml_file)
+        with open(self.csv_file, 'w') as f:
+            f.write('name;author;state;auto_install\nnew_module;OCA;installed;f\n')
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        if omm.timings.enabled:
+            omm.timings.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_import_phases(self):
+        """Test that an import reports all its phases."""
+        import io
+        from contextlib import redirect_stdout
+
+        omm.timings.start()
+        with redirect_stdout(io.StringIO()):
+            omm.process_csv(self.csv_file, self.yaml_file, '15.0')
+        omm.timings.stop()
+
+        self.assertEqual(sorted(omm.timings.phases), sorted(['load', 'parse CSV', 'merge', 'back-fill', 'sort', 'dump']))
+        report = io.StringIO()
+        omm.timings.report(report)
+        lines = report.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[1:]], ['load', 'parse', 'merge', 'back-fill', 'sort', 'dump', 'total'])
+
+    def test_nested_phases_exclusive(self):
+        """Test that time of nested phases and generators is not counted twice."""
+        import time
+
+        def rows():
+            time.sleep(0.05)
+            yield 1
+
+        omm.timings.start()
+        with omm.timings.phase('merge'):
+            with omm.timings.phase('back-fill'):
+                time.sleep(0.05)
+            list(omm.timings.iterate('parse CSV', rows()))
+        omm.timings.stop()
+
+        self.assertLess(omm.timings.phases['merge'][1], 0.04)
+        self.assertGreaterEqual(omm.timings.phases['back-fill'][1], 0.05)
+        self.assertGreaterEqual(omm.timings.phases['parse CSV'][1], 0.05)
+
+    def test_cli_timings_and_profile(self):
+        """Test the global --timings and --profile options."""
+        import pstats
+        import subprocess
+
+        profile_file = os.path.join(self.temp_dir, 'omm.prof')
+        omm_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'omm.py')
+        result = subprocess.run(
+            [sys.executable, omm_file, '--timings', '--profile', profile_file, 'analyse', self.yaml_file, '12.0'],
+            capture_output=True, text=True, check=True
+        )
+
+        self.assertIn('Not evaluated: 1 modules', result.stdout)
+        self.assertIn('load', result.stderr)
+        self.assertIn('total', result.stderr)
+        self.assertTrue(pstats.Stats(profile_file).total_calls)
+
+
+class TestOMMBenchmarkSuite(unittest.TestCase):
+    """Test cases for the benchmark suite and its synthetic data."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_generated_files(self):
+        """Test that the generated files contain duplicate version keys and import cleanly."""
+        import io
+        from contextlib import redirect_stdout
+        import benchmark
+
+        yaml_file, csv_file = benchmark.generate_files(self.temp_dir, 200, duplicate_keys=0.5)
+        raw_keys = {key for entry in omm.load_yaml(yaml_file) for key in entry}
+        self.assertIn(17.0, raw_keys)
+        self.assertIn('17.0', raw_keys)
+
+        with redirect_stdout(io.StringIO()):
+            omm.process_csv(csv_file, yaml_file, '17.0')
+        data = omm.load_yaml(yaml_file)
+        self.assertGreater(len(data), 200)
+        self.assertNotIn(17.0, {key for entry in data for key in entry})
+
+    def test_run_and_baseline(self):
+        """Test a small benchmark run and the regression check against a baseline."""
+        import io
+        from contextlib import redirect_stdout
+        import benchmark
+
+        with redirect_stdout(io.StringIO()) as output:
+            results = benchmark.run([100], commands=['analyse', 'compare'])
+        self.assertEqual([result['command'] for result in results], ['compare', 'analyse', 'analyse (cold cache)', 'analyse (warm cache)'])
+        self.assertTrue(all(result['peak_bytes'] for result in results))
+        self.assertIn('compare', output.getvalue())
+
+        baseline = [dict(result, seconds=result['seconds'] / 10) for result in results]
+        self.assertEqual(len(benchmark.regressions(results, baseline, 1.5)), 4)
+        self.assertEqual(benchmark.regressions(results, results, 1.5), [])
+
+
+class TestOMMMergeBenchmark(unittest.TestCase):
+    """Regression benchmark for merging large CSV imports into large YAML files."""
+
+    module_count = 50000
+    # Loading, merging and writing the files end to end. Most of it is spent
+    # in LibYAML, the previous linear scan per module needed minutes alone.
+    time_budget = 60.0
+
+    def setUp(self):
+        """Set up the synthetic YAML file and CSV export."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_file = os.path.join(self.temp_dir, 'modules.yaml')
+        self.csv_file = os.path.join(self.temp_dir, 'modules.csv')
+
+        with open(self.yaml_file, 'w') as f:
+            for i in range(self.module_count):
+                # Alternate string and numeric version keys like real-world files
+                version_key = "'12.0'" if i % 2 else '12.0'
+                f.write(
+                    f"- name: module_{i:06d}\n"
+                    f"  author: Odoo Community Association (OCA)\n"
+                    f"  {version_key}:\n"
+                    f"    state: installed\n"
+                    f"    auto_install: f\n"
+                    f"    evaluation: required\n"
+                    f"    comment: ''\n"
+                )
+
+        # Half of the CSV modules overlap with the YAML, half are new
+        self.offset = self.module_count // 2
+        with open(self.csv_file, 'w') as f:
+            f.write('name;author;state;auto_install\n')
+            for i in range(self.offset, self.offset + self.module_count):
+                f.write(f'module_{i:06d};Test Author;installed;t\n')
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_merge_50k_modules_into_50k_entries(self):
+        """Test that importing a CSV export scales linearly with the number of modules."""
+        import io
+        import time
+        from contextlib import redirect_stdout
+
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            omm.process_csv(self.csv_file, self.yaml_file, '12.0')
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, self.time_budget)
+
+        modules = omm.load_yaml(self.yaml_file)
+        self.assertEqual(len(modules), self.offset + self.module_count)
+        # Modules missing from the CSV are marked as not installed
+        self.assertEqual(modules[0]['12.0']['state'], 'not installed')
+        self.assertEqual(modules[1]['12.0']['state'], 'not installed')
+        # Overlapping modules keep their evaluation and get the CSV state
+        self.assertEqual(modules[self.offset]['12.0']['auto_install'], 't')
+        self.assertEqual(modules[self.offset]['12.0']['evaluation'], 'required')
+        # New modules are added
+        self.assertEqual(modules[-1]['name'], f'module_{self.offset + self.module_count - 1:06d}')
+
+
+class TestOMMStartupBenchmark(unittest.TestCase):
+    """Regression benchmark for the startup time of the command line interface."""
+
+    # Import time of omm and the modules imported by a command, measured
+    # with python -X importtime. Previously importing omm alone took 180 ms.
+    time_budget = 0.2
+
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    @classmethod
+    def setUpClass(cls):
+        """Compile omm once, so the measured runs use the bytecode cache."""
+        import subprocess
+        subprocess.run([sys.executable, '-c', 'import omm'], cwd=cls.package_dir, check=True)
+
+    def import_times(self, code):
+        """Return the modules imported by omm and code, with the import time in seconds of the outermost ones."""
+        import subprocess
+
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import omm; {code}'],
+                                cwd=self.package_dir, capture_output=True, text=True, check=True)
+        # Lines are "import time: <self us> | <cumulative us> | <module>",
+        # modules imported by another one are indented and listed before it
+        lines = [line.split('|')[1:] for line in result.stderr.splitlines() if line.startswith('import time:') and 'self [us]' not in line]
+        lines = [(int(cumulative) / 1e6, name[1:]) for cumulative, name in lines]
+        first = max(i for i, (seconds, name) in enumerate(lines) if name == 'omm')
+        while first > 0 and lines[first - 1][1].startswith(' '):
+            first -= 1
+        return {name.strip(): 0 if name.startswith(' ') else seconds for seconds, name in lines[first:]}
+
+    def test_version_without_heavy_imports(self):
+        """Test that --version neither imports PyYAML nor argparse."""
+        times = self.import_times("omm.main(['--version'])")
+
+        self.assertLess(sum(times.values()), self.time_budget, times)
+        self.assertNotIn('yaml', times)
+        self.assertNotIn('argparse', times)
+
+    def test_analyse_imports_only_what_it_needs(self):
+        """Test that analyse stays within the budget and skips the modules of other commands."""
+        yaml_file = os.path.join(self.package_dir, 'test', 'test_modules.yaml')
+        times = self.import_times(f"omm.main(['analyse', {yaml_file!r}, '12.0', '--no-cache'])")
+
+        self.assertLess(sum(times.values()), self.time_budget, times)
+        self.assertIn('yaml', times)
+        for module in ['http.server', 'concurrent.futures', 'sqlite3', 'csv', 'subprocess']:
+            self.assertNotIn(module, times)
+
+
 if __name__ == '__main__':
     # Run the tests
     unittest.main(verbosity=2)